@@ -0,0 +1,887 @@
+
+import os
+import sys
+import json
+import time
+import pickle
+import weakref
+import marshal
+import hashlib
+import tarfile
+import zipfile
+import tempfile
+import functools
+import threading
+import subprocess
+import importlib.util
+from contextlib import contextmanager
+from urllib.request import urlopen
+from collections import OrderedDict
+
+from rez.config import config as rezconfig
+
+from deliver.lib import expand_path, evaluation_lock, current_scope
+from deliver.git import fetch_remote_tags
+from deliver.exceptions import RezDeliverPayloadError
+
+
+def get_cache_root(*names):
+    """Return cache dir path under `cache_root` from deliver config
+
+    Args:
+        *names (str): Sub-dir names to join with the cache root.
+
+    Returns:
+        str: Cache dir path, or None if `cache_root` is not configured.
+
+    """
+    deliverconfig = rezconfig.plugins.command.deliver
+    root = deliverconfig.cache_root
+    if not root:
+        return None
+    return os.path.join(expand_path(root), *names)
+
+
+def write_atomic(filepath, content):
+    dirpath = os.path.dirname(filepath)
+    if not os.path.isdir(dirpath):
+        os.makedirs(dirpath)
+
+    fd, tmp = tempfile.mkstemp(dir=dirpath, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp, filepath)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class PackageDataCache(object):
+    """Persistent on-disk cache of evaluated developer package data
+
+    Each entry is the `data` dict of one evaluated package.py, keyed by the
+    file path, the `REZ_DELIVER_PKG_PAYLOAD_VER` tag it was evaluated with
+    and the deliver release mode. An entry is only served if the package.py
+    still has the same mtime and size as when it was cached.
+
+    The cache is disabled if `cache_root` is not set in deliver config.
+
+    """
+    FORMAT = 1
+
+    def __init__(self, root=None):
+        self._root = root
+
+    @classmethod
+    def from_config(cls):
+        return cls(root=get_cache_root("packages"))
+
+    @property
+    def enabled(self):
+        return bool(self._root)
+
+    def get(self, filepath, ver_tag=None, release=False):
+        """Get cached package data
+
+        Args:
+            filepath (str): The package.py file path
+            ver_tag (str): Payload version tag, optional.
+            release (bool): Deliver release mode
+
+        Returns:
+            dict: Package data, or None if not cached or outdated.
+
+        """
+        if not self.enabled:
+            return None
+
+        stamp = self._stamp(filepath)
+        if stamp is None:
+            return None
+
+        cache_file = self._cache_file(filepath, ver_tag, release)
+        try:
+            with open(cache_file, "rb") as f:
+                entry = pickle.load(f)
+        except Exception:
+            return None
+
+        if entry.get("format") != self.FORMAT or entry.get("stamp") != stamp:
+            return None
+
+        return entry["data"]
+
+    def put(self, filepath, data, ver_tag=None, release=False):
+        """Save evaluated package data into cache
+
+        Args:
+            filepath (str): The package.py file path
+            data (dict): Evaluated package data
+            ver_tag (str): Payload version tag, optional.
+            release (bool): Deliver release mode
+
+        Returns:
+            None
+
+        """
+        if not self.enabled:
+            return
+
+        stamp = self._stamp(filepath)
+        if stamp is None:
+            return
+
+        entry = {
+            "format": self.FORMAT,
+            "stamp": stamp,
+            "data": data,
+        }
+        try:
+            content = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print("Package data not cacheable [%s]: %s" % (filepath, str(e)))
+            return
+
+        cache_file = self._cache_file(filepath, ver_tag, release)
+        try:
+            write_atomic(cache_file, content)
+        except (IOError, OSError) as e:
+            print("Failed to write package cache [%s]: %s" % (cache_file, e))
+
+    def _cache_file(self, filepath, ver_tag, release):
+        key = repr((os.path.normpath(filepath), ver_tag or "", bool(release)))
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self._root, digest[:2], digest + ".pkl")
+
+    @staticmethod
+    def _stamp(filepath):
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+
+class TagCache(object):
+    """Persistent on-disk cache of git remote tags
+
+    Entries are keyed by git url and considered stale after `ttl` seconds.
+    Stale entries are still served, and can be revalidated in background
+    so the next session will get the update.
+
+    The cache is disabled if `cache_root` is not set in deliver config.
+
+    """
+    FORMAT = 1
+
+    def __init__(self, root=None, ttl=None):
+        self._root = root
+        self._ttl = ttl
+        self._revalidating = dict()  # url -> thread
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        deliverconfig = rezconfig.plugins.command.deliver
+        return cls(root=get_cache_root("tags"),
+                   ttl=deliverconfig.git_tag_cache_ttl)
+
+    @property
+    def enabled(self):
+        return bool(self._root)
+
+    def get(self, url):
+        """Get cached tags of git remote
+
+        Args:
+            url (str): Git remote url
+
+        Returns:
+            tuple: Tag names list (or None if not cached) and a bool of
+                whether the entry is still fresh.
+
+        """
+        if not self.enabled:
+            return None, False
+
+        try:
+            with open(self._cache_file(url), "r") as f:
+                entry = json.load(f)
+        except Exception:
+            return None, False
+
+        if entry.get("format") != self.FORMAT or entry.get("url") != url:
+            return None, False
+
+        age = time.time() - entry["time"]
+        fresh = self._ttl is None or 0 <= age < self._ttl
+
+        return entry["tags"], fresh
+
+    def put(self, url, tags):
+        """Save tags of git remote into cache
+
+        Args:
+            url (str): Git remote url
+            tags (list): Tag names
+
+        Returns:
+            None
+
+        """
+        if not self.enabled:
+            return
+
+        entry = {
+            "format": self.FORMAT,
+            "url": url,
+            "time": time.time(),
+            "tags": list(tags),
+        }
+        cache_file = self._cache_file(url)
+        try:
+            write_atomic(cache_file, json.dumps(entry).encode("utf-8"))
+        except (IOError, OSError) as e:
+            print("Failed to write tag cache [%s]: %s" % (cache_file, e))
+
+    def revalidate(self, urls, workers=None, timeout=None, mirror_root=None):
+        """List tags of git remotes in background thread and update cache
+
+        Args:
+            urls (list): Git remote urls
+            workers (int): Max number of concurrent git processes, optional.
+            timeout (float): Seconds to wait for each git call, optional.
+            mirror_root (str): Dir of local git mirrors, optional.
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            urls = [
+                url for url in urls
+                if url not in self._revalidating
+            ] if self.enabled else []
+            if not urls:
+                return
+
+            def revalidate():
+                try:
+                    tags = fetch_remote_tags(urls, workers, timeout,
+                                             mirror_root=mirror_root)
+                    for url_, tags_ in tags.items():
+                        self.put(url_, tags_)
+                finally:
+                    with self._lock:
+                        for url_ in urls:
+                            self._revalidating.pop(url_, None)
+
+            thread = threading.Thread(target=revalidate, daemon=True)
+            for url in urls:
+                self._revalidating[url] = thread
+            thread.start()
+
+    def join(self, timeout=None):
+        """Wait for background revalidations to finish"""
+        with self._lock:
+            threads = set(self._revalidating.values())
+        for thread in threads:
+            thread.join(timeout)
+
+    def _cache_file(self, url):
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self._root, digest[:2], digest + ".json")
+
+
+class PayloadCache(object):
+    """Content-addressed local cache of downloaded payload archives
+
+    Archives are stored by their sha256 checksum, and each url remembers
+    the checksum it was downloaded as, so one url is only downloaded once.
+    Any url that `urlopen` supports works, including file://.
+
+    If `cache_root` is not set, archives are downloaded into temp files and
+    not being cached. A temp archive returned by `fetch` is for the caller
+    to remove, `extract` removes it by itself.
+
+    """
+    ChunkSize = 1024 * 1024
+
+    def __init__(self, root=None, timeout=None):
+        self._root = root
+        self._timeout = timeout
+
+    @classmethod
+    def from_config(cls):
+        deliverconfig = rezconfig.plugins.command.deliver
+        return cls(root=get_cache_root("payloads"),
+                   timeout=deliverconfig.download_timeout)
+
+    @property
+    def root(self):
+        return self._root
+
+    def fetch(self, url, sha256=None):
+        """Get archive from cache, or download it into cache
+
+        Args:
+            url (str): Archive url
+            sha256 (str): Expected checksum, optional.
+
+        Returns:
+            str: Path of the cached archive
+
+        Raises:
+            RezDeliverPayloadError: If download failed or checksum mismatch.
+
+        """
+        sha256 = sha256.lower() if sha256 else None
+        digest = sha256 or self._read_url_index(url)
+        if digest:
+            blob = self._blob_file(digest)
+            if blob and os.path.isfile(blob):
+                return blob
+
+        return self._download(url, sha256)
+
+    def extract(self, url, dest, sha256=None):
+        """Extract archive from cache into dest dir, download if not cached
+
+        Tar archives are extracted by streaming from the cached file, zip
+        archives are read from it directly, no temp copy is made.
+
+        Args:
+            url (str): Archive url
+            dest (str): Dir path to extract to
+            sha256 (str): Expected checksum, optional.
+
+        Returns:
+            str: The dest dir path
+
+        Raises:
+            RezDeliverPayloadError: If download failed, checksum mismatch or
+                unknown archive format.
+
+        """
+        archive = self.fetch(url, sha256=sha256)
+        try:
+            self._extract(archive, url, dest)
+        finally:
+            if not self._root:
+                # not cached, temp download
+                os.remove(archive)
+
+        return dest
+
+    def _extract(self, archive, url, dest):
+        if not os.path.isdir(dest):
+            os.makedirs(dest)
+
+        if tarfile.is_tarfile(archive):
+            with tarfile.open(archive, "r|*") as tar:
+                if hasattr(tarfile, "data_filter"):
+                    tar.extractall(dest, filter="data")
+                else:
+                    for member in tar:
+                        _check_member_path(member.name, url)
+                        tar.extract(member, dest)
+
+        elif zipfile.is_zipfile(archive):
+            with zipfile.ZipFile(archive) as zf:
+                zf.extractall(dest)
+
+        else:
+            raise RezDeliverPayloadError("Unknown archive format: %s" % url)
+
+    def _download(self, url, sha256=None):
+        if self._root:
+            tmp_dir = os.path.join(self._root, "blobs")
+            if not os.path.isdir(tmp_dir):
+                os.makedirs(tmp_dir)
+            prefix = ".tmp-"
+        else:
+            tmp_dir = None  # system temp dir
+            prefix = "rez-deliver-payload-"
+
+        hasher = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=tmp_dir, prefix=prefix)
+        try:
+            with os.fdopen(fd, "wb") as f, \
+                    urlopen(url, timeout=self._timeout) as response:
+                while True:
+                    chunk = response.read(self.ChunkSize)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    f.write(chunk)
+        except Exception as e:
+            os.remove(tmp)
+            raise RezDeliverPayloadError(
+                "Failed to download %s: %s" % (url, str(e)))
+
+        digest = hasher.hexdigest()
+        if sha256 and digest != sha256:
+            os.remove(tmp)
+            raise RezDeliverPayloadError(
+                "Checksum mismatch %s: expected sha256 %s, got %s"
+                % (url, sha256, digest))
+
+        if not self._root:
+            return tmp
+
+        blob = self._blob_file(digest)
+        if not os.path.isdir(os.path.dirname(blob)):
+            os.makedirs(os.path.dirname(blob))
+        os.replace(tmp, blob)
+        self._write_url_index(url, digest)
+
+        return blob
+
+    def _blob_file(self, digest):
+        if not self._root:
+            return None
+        return os.path.join(self._root, "blobs", digest[:2], digest)
+
+    def _url_index_file(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self._root, "urls", key[:2], key + ".json")
+
+    def _read_url_index(self, url):
+        if not self._root:
+            return None
+        try:
+            with open(self._url_index_file(url), "r") as f:
+                entry = json.load(f)
+        except Exception:
+            return None
+        return entry.get("sha256") if entry.get("url") == url else None
+
+    def _write_url_index(self, url, digest):
+        entry = {"url": url, "sha256": digest}
+        try:
+            write_atomic(self._url_index_file(url),
+                         json.dumps(entry).encode("utf-8"))
+        except (IOError, OSError) as e:
+            print("Failed to write payload url index [%s]: %s" % (url, e))
+
+
+def _check_member_path(name, url):
+    if os.path.isabs(name) or ".." in name.replace("\\", "/").split("/"):
+        raise RezDeliverPayloadError(
+            "Unsafe path %r in archive: %s" % (name, url))
+
+
+class CodeCache(object):
+    """Cache of compiled package.py code objects
+
+    Code objects are kept in memory, keyed by file path with its mtime and
+    size, and also marshalled under `cache_root` if configured. So evaluating
+    the same package.py repeatedly, e.g. once per git tag, only compiles it
+    once.
+
+    """
+
+    def __init__(self):
+        self._codes = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._codes.clear()
+
+    def compile(self, source, filename, mode, flags=0, dont_inherit=False,
+                optimize=-1):
+        """Drop-in replacement of builtin `compile` for package.py"""
+        if mode != "exec" or flags or not os.path.isfile(filename):
+            return compile(source, filename, mode, flags, dont_inherit,
+                           optimize)
+
+        st = os.stat(filename)
+        stamp = (st.st_mtime_ns, st.st_size)
+        raw = source.encode("utf-8") if isinstance(source, str) else source
+        digest = hashlib.sha1(raw).hexdigest()
+
+        cached = self._codes.get(filename)
+        if cached is None:
+            cached = self._load(filename)
+
+        if cached is not None and cached[:2] == (stamp, digest):
+            self.hits += 1
+            self._codes[filename] = cached
+            return cached[2]
+
+        self.misses += 1
+        code = compile(source, filename, mode, flags, dont_inherit, optimize)
+        cached = (stamp, digest, code)
+        self._codes[filename] = cached
+        self._save(filename, cached)
+
+        return code
+
+    def _cache_file(self, filename):
+        root = get_cache_root("code")
+        if not root:
+            return None
+        key = hashlib.sha1(filename.encode("utf-8")).hexdigest()
+        return os.path.join(root, key[:2], key + ".marshal")
+
+    def _load(self, filename):
+        cache_file = self._cache_file(filename)
+        if not cache_file or not os.path.isfile(cache_file):
+            return None
+        try:
+            with open(cache_file, "rb") as f:
+                magic, stamp, digest, code = marshal.load(f)
+        except Exception:
+            return None
+        if magic != importlib.util.MAGIC_NUMBER:
+            return None
+        return tuple(stamp), digest, code
+
+    def _save(self, filename, cached):
+        cache_file = self._cache_file(filename)
+        if not cache_file:
+            return
+        stamp, digest, code = cached
+        content = marshal.dumps(
+            (importlib.util.MAGIC_NUMBER, stamp, digest, code)
+        )
+        try:
+            write_atomic(cache_file, content)
+        except (IOError, OSError) as e:
+            print("Failed to write code cache [%s]: %s" % (cache_file, e))
+
+
+code_cache = CodeCache()
+
+
+@contextmanager
+def use_code_cache():
+    """Context that makes rez compile package.py through `code_cache`"""
+    from rez import serialise
+
+    with evaluation_lock:
+        missing = object()
+        previous = serialise.__dict__.get("compile", missing)
+        # shadowing builtin `compile` in module namespace
+        serialise.compile = code_cache.compile
+        try:
+            yield
+        finally:
+            if previous is missing:
+                del serialise.compile
+            else:
+                serialise.compile = previous
+
+
+class _SharedList(list):
+    """A read-only list that can be weak referenced, for sharing equal lists
+
+    Still a `list` so rez schema validation accepts it, but mutating it
+    raises `TypeError` since it's shared by all packages that have the same
+    content. Copies made by `copy` or `pickle` are plain lists.
+
+    """
+    __slots__ = ("__weakref__",)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Interned package data list is read-only, "
+                        "make a copy with list() to modify.")
+
+    append = extend = insert = remove = pop = clear = _read_only
+    sort = reverse = _read_only
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+
+    def __reduce_ex__(self, protocol):
+        return list, (list(self),)
+
+
+class _Interner(object):
+    """Share equal strings and string lists between package data
+
+    Strings are interned by `sys.intern`. Lists (and nested lists) of strings
+    like `requires`, `tools` or `variants` are replaced by one shared
+    read-only list object per distinct content, only held by weak reference
+    here.
+
+    """
+
+    def __init__(self):
+        self._lists = weakref.WeakValueDictionary()
+
+    def intern_data(self, data):
+        """Intern package data in-place
+
+        Args:
+            data (dict): Package data
+
+        Returns:
+            dict: The same data dict
+
+        """
+        with evaluation_lock:
+            interned = {
+                self._intern(key): self._intern(value)
+                for key, value in data.items()
+            }
+            data.clear()
+            data.update(interned)
+        return data
+
+    def _intern(self, value):
+        if type(value) is str:
+            return sys.intern(value)
+        if isinstance(value, list):
+            key = self._freeze(value)
+            if key is None:
+                return value
+            shared = self._lists.get(key)
+            if shared is None:
+                shared = _SharedList(self._intern(v) for v in value)
+                self._lists[key] = shared
+            return shared
+        return value
+
+    def _freeze(self, value):
+        frozen = []
+        for item in value:
+            if type(item) is str:
+                frozen.append(item)
+            elif isinstance(item, list):
+                item = self._freeze(item)
+                if item is None:
+                    return None
+                frozen.append(item)
+            else:
+                return None
+        return tuple(frozen)
+
+
+interner = _Interner()
+
+
+class LoadedCache(object):
+    """In-memory store of loaded package families, in LRU order
+
+    Family versions are kept up to `max_families` and least recently used
+    ones get evicted, unlimited if `max_families` is 0 or None. Package data
+    stored in here is interned, so repeated strings and requirement lists
+    are shared between versions and families.
+
+    Only `get` and item access are counted as hits or misses, membership
+    test is not.
+
+    """
+
+    def __init__(self, max_families=None, on_evict=None):
+        """
+        Args:
+            max_families (int): Max number of families to keep, optional.
+            on_evict (callable): Called with evicted family names, optional.
+        """
+        self._families = OrderedDict()
+        self._max_families = max_families or 0
+        self._on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, name, default=None):
+        with evaluation_lock:
+            try:
+                versions = self._families[name]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._families.move_to_end(name)
+            return versions
+
+    def pop(self, name, default=None):
+        with evaluation_lock:
+            return self._families.pop(name, default)
+
+    def clear(self):
+        with evaluation_lock:
+            self._families.clear()
+
+    def stats(self):
+        """Return cache statistics
+
+        Returns:
+            dict: With keys `families`, `max_families`, `hits`, `misses`
+                and `evictions`.
+
+        """
+        return {
+            "families": len(self._families),
+            "max_families": self._max_families,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __getitem__(self, name):
+        missing = object()
+        versions = self.get(name, missing)
+        if versions is missing:
+            raise KeyError(name)
+        return versions
+
+    def __setitem__(self, name, versions):
+        if isinstance(versions, dict):
+            for data in versions.values():
+                interner.intern_data(data)
+
+        with evaluation_lock:
+            self._families[name] = versions
+            self._families.move_to_end(name)
+
+            evicted = []
+            while self._max_families \
+                    and len(self._families) > self._max_families:
+                evicted.append(self._families.popitem(last=False)[0])
+            self.evictions += len(evicted)
+
+        if evicted and self._on_evict is not None:
+            self._on_evict(evicted)
+
+    def __contains__(self, name):
+        return name in self._families
+
+    def __iter__(self):
+        return iter(list(self._families))
+
+    def __len__(self):
+        return len(self._families)
+
+
+class SubprocessMemo(object):
+    """Memo of subprocess output during package evaluation
+
+    Identical `subprocess.check_output` and output capturing
+    `subprocess.run` calls, e.g. `git shortlog` being called for each tag,
+    only spawn process once. Calls are identical if they have the same
+    arguments, working dir, `env` argument, values of environment
+    variables listed in `memoize_subprocess_env` and the same package.py
+    in working dir, so an edited package.py doesn't get the output of its
+    previous revision.
+
+    Calls from outside of an evaluation scope are not memoized.
+
+    """
+
+    def __init__(self):
+        self._results = dict()
+        self._calling = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        with evaluation_lock:
+            self._results.clear()
+
+    def wrap(self, func):
+        """Return memoized version of `subprocess.check_output` or `run`"""
+        @functools.wraps(func)
+        def memoized(*args, **kwargs):
+            # `check_output` calls module level `run`, which is memoized
+            # as well, only the outer call needs to be keyed.
+            key = None if getattr(self._calling, "active", False) \
+                else self._key(func, args, kwargs)
+            if key is None:
+                return func(*args, **kwargs)
+
+            try:
+                raised, result = self._results[key]
+            except KeyError:
+                self.misses += 1
+                self._calling.active = True
+                try:
+                    result = func(*args, **kwargs)
+                except subprocess.CalledProcessError as e:
+                    self._results[key] = (True, e)
+                    raise
+                finally:
+                    self._calling.active = False
+                self._results[key] = (False, result)
+                return result
+
+            self.hits += 1
+            if raised:
+                raise result
+            return result
+
+        memoized.__memoized__ = True
+        return memoized
+
+    def _key(self, func, args, kwargs):
+        if current_scope() is None:
+            return None
+
+        if func.__name__ == "run" and not (
+                kwargs.get("capture_output")
+                or kwargs.get("stdout") == subprocess.PIPE):
+            # output not captured, could be called for side effect
+            return None
+
+        argv = args[0] if args else kwargs.get("args")
+        argv = argv if isinstance(argv, (str, bytes)) \
+            else tuple(str(arg) for arg in argv)
+        cwd = str(kwargs.get("cwd") or os.getcwd())
+        env = kwargs.get("env")
+        env = None if env is None \
+            else tuple(sorted((str(k), str(v)) for k, v in env.items()))
+        deliverconfig = rezconfig.plugins.command.deliver
+        relevant = tuple(
+            (name, os.environ.get(name))
+            for name in deliverconfig.memoize_subprocess_env or []
+        )
+        options = tuple(sorted(
+            (k, repr(v)) for k, v in kwargs.items()
+            if k not in ("args", "cwd", "env", "timeout")
+        ))
+        stamp = _file_stamp(os.path.join(os.getcwd(), "package.py"))
+
+        return (func.__name__, argv, repr(args[1:]), cwd, env, relevant,
+                options, stamp)
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+subprocess_memo = SubprocessMemo()
+
+
+@contextmanager
+def use_subprocess_memo():
+    """Context that memoizes subprocess calls with `subprocess_memo`
+
+    Only if `memoize_subprocess` is enabled in deliver config.
+
+    """
+    deliverconfig = rezconfig.plugins.command.deliver
+    if not deliverconfig.memoize_subprocess \
+            or getattr(subprocess.check_output, "__memoized__", False):
+        yield
+        return
+
+    with evaluation_lock:
+        check_output = subprocess.check_output
+        run = subprocess.run
+        subprocess.check_output = subprocess_memo.wrap(check_output)
+        subprocess.run = subprocess_memo.wrap(run)
+        try:
+            yield
+        finally:
+            subprocess.check_output = check_output
+            subprocess.run = run
@@ -27,10 +27,8 @@ def list_developer_packages(requests=None):
         print("\nPackages available in this repository:")
         print("=" * 30)
 
-        for family in loader.iter_package_families():
-            if family.name in names:
-                for package in family.iter_packages():
-                    print(package.qualified_name)
+        for summary in loader.iter_package_summaries(names=names):
+            print(summary["qualified_name"])
 
 
 def deploy_packages(requests, path, dry_run=False, yes=False):
@@ -9,3 +9,11 @@ class RezDeliverRequestError(RezDeliverError):
 
 class RezDeliverFatalError(RezDeliverError):
     pass
+
+
+class RezDeliverPayloadError(RezDeliverError):
+    pass
+
+
+class RezDeliverEvaluationError(RezDeliverError):
+    pass
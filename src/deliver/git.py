@@ -0,0 +1,340 @@
+
+import os
+import re
+import heapq
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from functools import partial
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from rez.vendor.lockfile import LockFile, LockTimeout
+from rez.vendor.version.version import Version, VersionRange, VersionError
+
+# tokens of alphanumerics and underscores, separated by "." or "-"
+_version_like = re.compile(r"^\w+(?:[.-]\w+)*$")
+
+
+def ls_remote_tags(url, timeout=None):
+    """List tag names of a git remote with `git ls-remote`
+
+    Args:
+        url (str): Git remote url
+        timeout (float): Seconds to wait for git, optional.
+
+    Returns:
+        list: Tag names, or None if failed.
+
+    """
+    args = ["git", "ls-remote", "--tags", url]
+    try:
+        output = subprocess.check_output(args,
+                                         universal_newlines=True,
+                                         stdin=subprocess.DEVNULL,
+                                         timeout=timeout)
+    except subprocess.TimeoutExpired:
+        print("Timed out listing tags from %s" % url)
+        return None
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(e)
+        return None
+
+    return [line.split("refs/tags/")[-1] for line in output.splitlines()]
+
+
+def mirror_tags(url, mirror_root, timeout=None):
+    """List tag names of a git remote from its local bare mirror
+
+    The mirror is cloned on first use, and updated by an incremental fetch
+    afterward. Tags are then read from local refs without asking remote
+    again. Fallback to `ls_remote_tags` if the mirror cannot be updated.
+
+    Args:
+        url (str): Git remote url
+        mirror_root (str): Dir path that mirrors are kept in
+        timeout (float): Seconds to wait for git, optional.
+
+    Returns:
+        list: Tag names, or None if failed.
+
+    """
+    git_dir = update_mirror(url, mirror_root, timeout=timeout)
+    if git_dir is not None:
+        return read_local_tags(git_dir)
+
+    return ls_remote_tags(url, timeout=timeout)
+
+
+def update_mirror(url, mirror_root, timeout=None):
+    """Clone or incrementally fetch the local bare mirror of a git remote
+
+    Args:
+        url (str): Git remote url
+        mirror_root (str): Dir path that mirrors are kept in
+        timeout (float): Seconds to wait for git, optional.
+
+    Returns:
+        str: Mirror's git dir path, or None if failed.
+
+    """
+    git_dir = os.path.join(mirror_root, _url_digest(url) + ".git")
+
+    try:
+        if os.path.isdir(git_dir):
+            args = ["git", "--git-dir", git_dir,
+                    "fetch", "--quiet", "--prune", "--tags", "origin"]
+            subprocess.check_call(args,
+                                  stdin=subprocess.DEVNULL,
+                                  timeout=timeout)
+        else:
+            _clone_mirror(url, git_dir, timeout)
+
+    except subprocess.TimeoutExpired:
+        print("Timed out updating git mirror of %s" % url)
+    except (subprocess.CalledProcessError, OSError) as e:
+        print("Failed to update git mirror of %s: %s" % (url, str(e)))
+    else:
+        return git_dir
+
+    return None
+
+
+@contextmanager
+def checkout_worktree(git_dir, tag, path, timeout=None):
+    """Context that checks out a tag into a detached worktree and locks it
+
+    An existing worktree at `path` is reused if it is still clean and at
+    the tag's commit, otherwise it is reset to the tag and cleaned. The
+    worktree stays locked until the context exits, so other processes
+    can't check out into the same `path` while it is being used, e.g. by a
+    build.
+
+    Args:
+        git_dir (str): Path of a (bare) git dir, e.g. a mirror
+        tag (str): Tag name
+        path (str): Worktree path
+        timeout (float): Seconds to wait for git and the lock, optional.
+
+    Yields:
+        str: Worktree path, or None if failed.
+
+    """
+    parent = os.path.dirname(path)
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+
+    lock = LockFile(path)
+    try:
+        lock.acquire(timeout=timeout)
+    except LockTimeout:
+        print("Timed out waiting for other checkout into %s" % path)
+        yield None
+        return
+
+    try:
+        try:
+            _checkout_worktree(git_dir, tag, path, timeout)
+        except subprocess.TimeoutExpired:
+            print("Timed out checking out %s into %s" % (tag, path))
+            path = None
+        except (subprocess.CalledProcessError, OSError) as e:
+            print("Failed to check out %s into %s: %s" % (tag, path, str(e)))
+            path = None
+
+        yield path
+
+    finally:
+        lock.release()
+
+
+def _checkout_worktree(git_dir, tag, path, timeout):
+    def git(*args, **kwargs):
+        return subprocess.check_output(args,
+                                       universal_newlines=True,
+                                       stdin=subprocess.DEVNULL,
+                                       timeout=timeout,
+                                       **kwargs).strip()
+
+    commit = git("git", "--git-dir", git_dir,
+                 "rev-parse", "refs/tags/%s^{commit}" % tag)
+
+    if os.path.isdir(path):
+        head = git("git", "-C", path, "rev-parse", "HEAD")
+        status = git("git", "-C", path, "status", "--porcelain",
+                     "--ignored")
+        if head == commit and not status:
+            return
+
+        # polluted by previous build, or not at the tag
+        git("git", "-C", path, "reset", "--quiet", "--hard", commit)
+        git("git", "-C", path, "clean", "--quiet", "-ffdx")
+        return
+
+    # forget worktrees that have been removed
+    git("git", "--git-dir", git_dir, "worktree", "prune")
+    git("git", "--git-dir", git_dir, "worktree", "add", "--quiet",
+        "--detach", path, commit)
+
+
+def _url_digest(url):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def _clone_mirror(url, git_dir, timeout):
+    if not os.path.isdir(os.path.dirname(git_dir)):
+        os.makedirs(os.path.dirname(git_dir))
+
+    # clone into temp dir first, so a partial clone never gets used
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(git_dir), prefix=".tmp-")
+    try:
+        args = ["git", "clone", "--quiet", "--mirror", url, tmp]
+        subprocess.check_call(args,
+                              stdin=subprocess.DEVNULL,
+                              timeout=timeout)
+        os.rename(tmp, git_dir)
+    finally:
+        if os.path.isdir(tmp):
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def read_local_tags(git_dir):
+    """Read tag names from refs of a local git dir without running git
+
+    Both loose refs and `packed-refs` are read.
+
+    Args:
+        git_dir (str): Path of a (bare) git dir
+
+    Returns:
+        list: Tag names
+
+    """
+    tags = dict()
+
+    try:
+        with open(os.path.join(git_dir, "packed-refs"), "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line[0] in "#^":
+                    continue
+                ref = line.split(" ", 1)[-1]
+                if ref.startswith("refs/tags/"):
+                    tags[ref[len("refs/tags/"):]] = True
+    except (IOError, OSError):
+        pass
+
+    tags_dir = os.path.join(git_dir, "refs", "tags")
+    for dirpath, _, filenames in os.walk(tags_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            tag = os.path.relpath(path, tags_dir).replace(os.sep, "/")
+            tags[tag] = True
+
+    return list(tags)
+
+
+def fetch_remote_tags(urls, workers=None, timeout=None, mirror_root=None):
+    """List tags of multiple git remotes concurrently
+
+    Identical urls are only listed once.
+
+    Args:
+        urls (list): Git remote urls
+        workers (int): Max number of concurrent git processes, optional.
+        timeout (float): Seconds to wait for each git call, optional.
+        mirror_root (str): List tags from local mirrors kept in this dir
+            instead of `git ls-remote`, optional.
+
+    Returns:
+        dict: Url as key and tag names as value, failed ones are excluded.
+
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return dict()
+
+    if mirror_root:
+        list_tags = partial(mirror_tags,
+                            mirror_root=mirror_root,
+                            timeout=timeout)
+    else:
+        list_tags = partial(ls_remote_tags, timeout=timeout)
+
+    workers = max(1, min(workers or len(urls), len(urls)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(list_tags, urls)
+        return {
+            url: tags for url, tags in zip(urls, results)
+            if tags is not None
+        }
+
+
+def select_tags(tags, include=None, exclude=None, range_=None, limit=None,
+                source=None):
+    """Select latest version tags by policy
+
+    Peeled refs (`<tag>^{}`) are deduplicated, tags are pre-filtered by
+    regex before being parsed as `Version`, and only the top `limit` ones
+    are kept by heap selection, so it stays fast on repositories that have
+    lots of tags. Unparsable tags are reported in one line.
+
+    Args:
+        tags (iterable): Tag names
+        include (str): Regex that tag must match, optional.
+        exclude (str): Regex that tag must not match, optional.
+        range_ (str): Version range that tag must be in, optional.
+        limit (int): Max number of tags to select, no limit if not given.
+        source (str): Where tags are from, for reporting.
+
+    Returns:
+        list: Selected tags as version strings, sorted from oldest.
+
+    """
+    include = re.compile(include) if include else None
+    exclude = re.compile(exclude) if exclude else None
+    range_ = VersionRange(range_) if range_ else None
+
+    seen = set()
+    versions = []
+    unparsable = []
+    for tag in tags:
+        if tag.endswith("^{}"):
+            tag = tag[:-3]
+        if tag in seen:
+            continue
+        seen.add(tag)
+
+        if include is not None and not include.search(tag):
+            continue
+        if exclude is not None and exclude.search(tag):
+            continue
+
+        if not _version_like.match(tag):
+            unparsable.append(tag)
+            continue
+        try:
+            version = Version(tag)
+        except VersionError:
+            unparsable.append(tag)
+            continue
+
+        if range_ is not None and not range_.contains_version(version):
+            continue
+        versions.append(version)
+
+    if unparsable:
+        print("Skipped %d unparsable tag(s)%s: %s%s" % (
+            len(unparsable),
+            (" from %s" % source) if source else "",
+            ", ".join(unparsable[:5]),
+            " ..." if len(unparsable) > 5 else "",
+        ))
+
+    if limit:
+        selected = heapq.nlargest(limit, versions)
+    else:
+        selected = versions
+
+    return [str(version) for version in sorted(selected)]
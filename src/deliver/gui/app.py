@@ -38,6 +38,7 @@ class Window(QtWidgets.QWidget):
 
         # signals
         pages["pkgBook"].selected.connect(self.on_package_selected)
+        pages["pkgBook"].refreshed.connect(ctrl.on_git_tags_refreshed)
         pages["install"].targeted.connect(ctrl.on_target_changed)
         pages["install"].manifested.connect(ctrl.on_manifested)
         pages["install"].installed.connect(ctrl.on_installed)
@@ -34,6 +34,14 @@ class TreeItem(dict):
         child._parent = self
         self._children.append(child)
 
+    def insert_child(self, row, child):
+        child._parent = self
+        self._children.insert(row, child)
+
+    def remove_child(self, child):
+        self._children.remove(child)
+        child._parent = None
+
 
 class AbstractTreeModel(QtCore.QAbstractItemModel):
     Headers = []
@@ -69,6 +69,7 @@ class Controller(QtCore.QObject):
 
         timers = {
             "packageSearch": QtCore.QTimer(self),
+            "repoWatch": QtCore.QTimer(self),
         }
 
         models_ = {
@@ -78,10 +79,17 @@ class Controller(QtCore.QObject):
         }
 
         timers["packageSearch"].timeout.connect(self.on_package_searched)
+        timers["repoWatch"].timeout.connect(self.on_repository_polled)
 
         self._state = state
         self._timers = timers
         self._models = models_
+        self._polling = False
+
+        deliverconfig = rezconfig.plugins.command.deliver
+        if deliverconfig.watch_dev_repositories:
+            state["loader"].watch()
+            timers["repoWatch"].start(int(deliverconfig.watch_interval * 1000))
 
     @property
     def state(self):  # state is also like a model and good to be exposed
@@ -99,6 +107,34 @@ class Controller(QtCore.QObject):
     def on_package_searched(self):
         self._models["pkgBook"].reset(self.iter_dev_packages())
 
+    def on_repository_polled(self):
+        if self._polling:
+            return  # previous poll still waiting for loader
+
+        def poll():
+            loader = self._state["loader"]
+            changed = loader.poll_changes()
+            items = list(self.iter_dev_packages(families=changed)) \
+                if changed else []
+            return changed, items
+
+        def on_polled(result):
+            self._polling = False
+            changed, items = result
+            if changed:
+                self._models["pkgBook"].update_families(changed, items)
+
+        def on_failed(exception, error=None):
+            self._polling = False
+            print(error or exception)
+
+        self._polling = True
+        util.defer(poll, on_success=on_polled, on_failure=on_failed)
+
+    def on_git_tags_refreshed(self):
+        self._state["loader"].refresh_git_tags()
+        self.defer_search_packages()
+
     def on_target_changed(self, path):
         installer = self._state["installer"]
         installer.deploy_to(path)
@@ -117,34 +153,33 @@ class Controller(QtCore.QObject):
         # TODO: no track back on error
         util.defer(install)
 
-    def iter_dev_packages(self):
+    def iter_dev_packages(self, families=None):
         loader = self._state["loader"]
         seen = dict()
 
-        for family in loader.iter_package_families():
-            name = family.name
-            path = family.resource.location
-
-            for package in family.iter_packages():
-
-                qualified_name = package.qualified_name
-
-                if qualified_name in seen:
-                    seen[qualified_name]["locations"].append(path)
-                    continue
-
-                doc = {
-                    "family": name,
-                    "version": str(package.version),
-                    "uri": package.uri,
-                    "tools": package.tools or [],
-                    "qualified_name": qualified_name,
-                    "locations": [path],
-                    "numVariants": package.num_variants,
-                }
-                seen[qualified_name] = doc
-
-                yield doc
+        for summary in loader.iter_package_summaries(names=families):
+            name = summary["name"]
+            path = summary["location"]
+
+            qualified_name = summary["qualified_name"]
+
+            if qualified_name in seen:
+                seen[qualified_name]["locations"].append(path)
+                continue
+
+            doc = {
+                "family": name,
+                "version": summary["version"],
+                "uri": summary["uri"],
+                "tools": summary["tools"],
+                "qualified_name": qualified_name,
+                "locations": [path],
+                "numVariants": summary["num_variants"],
+                "description": summary["description"],
+            }
+            seen[qualified_name] = doc
+
+            yield doc
 
     def find_dev_package(self, name):
         loader = self._state["loader"]
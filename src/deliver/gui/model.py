@@ -58,17 +58,82 @@ class PackageBookModel(common.model.AbstractTreeModel):
     def reset(self, items=None):
         self.beginResetModel()
         self._groups.clear()
-        family = None
-        families = set()
 
-        def cover_previous_family():
-            if family:
-                family["tools"] = ", ".join(sorted(family["tools"]))
+        for family_name, family_items in self._group_by_family(items):
+            family = self._make_family(family_name, family_items)
+            self._groups.add(family["_group"])
+            self.add_child(family)
 
+        self.endResetModel()
+
+    def update_families(self, names, items=None):
+        """Replace rows of given families without resetting whole model
+
+        Check states of versions and variants that still exist are kept.
+
+        Args:
+            names (list): Names of changed families, include removed ones.
+            items (iterable): New package items of those families
+
+        """
+        grouped = dict(self._group_by_family(items))
+        root = QtCore.QModelIndex()
+
+        for family_name in names:
+            checked = dict()
+            existing = next((f for f in self.root.children()
+                             if f["family"] == family_name), None)
+            if existing is not None:
+                for version in existing.children():
+                    checked[version["name"]] = version["_isChecked"]
+                    for variant in version.children():
+                        checked[variant["name"]] = variant["_isChecked"]
+
+                row = existing.row()
+                self.beginRemoveRows(root, row, row)
+                self.root.remove_child(existing)
+                self.endRemoveRows()
+
+            if family_name not in grouped:
+                continue
+
+            family = self._make_family(family_name, grouped[family_name])
+            for version in family.children():
+                for item in [version] + version.children():
+                    item["_isChecked"] = checked.get(item["name"],
+                                                     QtCheckState.Unchecked)
+
+            key = family_name.lower()
+            row = next((i for i, f in enumerate(self.root.children())
+                        if f["family"].lower() > key),
+                       self.root.childCount())
+            self.beginInsertRows(root, row, row)
+            self.root.insert_child(row, family)
+            self.endInsertRows()
+
+        self._groups = {f["_group"] for f in self.root.children()}
+
+    def _group_by_family(self, items):
+        grouped = []
         for item in sorted(items or [], key=lambda i: i["family"].lower()):
-            family_name = item["family"]
+            if not grouped or grouped[-1][0] != item["family"]:
+                grouped.append((item["family"], []))
+            grouped[-1][1].append(item)
+        return grouped
+
+    def _make_family(self, family_name, items):
+        initial = family_name[0].upper()
+        family = PackageBookItem({
+            "_type": "family",
+            "_group": initial,
+            "name": family_name,
+            "family": family_name,
+            "version": "",
+            "tools": set(),  # later be formatted from all versions
+        })
+
+        for item in items:
             tools = item["tools"][:]
-            initial = family_name[0].upper()
 
             item.update({
                 "_type": "version",
@@ -85,28 +150,12 @@ class PackageBookModel(common.model.AbstractTreeModel):
                 variant["index"] = index
                 package.add_child(variant)
 
-            if family_name not in families:
-                cover_previous_family()
-
-                family = PackageBookItem({
-                    "_type": "family",
-                    "_group": initial,
-                    "name": family_name,
-                    "family": family_name,
-                    "version": "",
-                    "tools": set(),  # later be formatted from all versions
-                })
-
-                families.add(family_name)
-                self._groups.add(initial)
-                self.add_child(family)
-
             family["tools"].update(tools)
             family.add_child(package)
 
-        cover_previous_family()
+        family["tools"] = ", ".join(sorted(family["tools"]))
 
-        self.endResetModel()
+        return family
 
     def data(self, index, role=QtCore.Qt.DisplayRole):
         if not index.isValid():
@@ -38,13 +38,16 @@ class PackageBookTabBar(common.view.VerticalDocTabBar):
 class PackageBookView(QtWidgets.QWidget):
     """Single page tab widget"""
     selected = QtCore.Signal(str, int)  # package name, variant index
+    refreshed = QtCore.Signal()
 
     def __init__(self, parent=None):
         super(PackageBookView, self).__init__(parent=parent)
         self.setObjectName("PackageBookView")
 
         widgets = {
+            "head": QtWidgets.QWidget(),
             "search": QtWidgets.QLineEdit(),
+            "refresh": QtWidgets.QPushButton("Refresh Tags"),
             "book": QtWidgets.QWidget(),
             "page": QtWidgets.QWidget(),
             "side": QtWidgets.QWidget(),
@@ -55,8 +58,15 @@ class PackageBookView(QtWidgets.QWidget):
         widgets["side"].setObjectName("PackageBookSide")
 
         widgets["search"].setPlaceholderText(" Search by family or tool..")
+        widgets["refresh"].setToolTip(
+            "Re-list git tags of developer packages from remote.")
 
         # Layouts..
+        layout = QtWidgets.QHBoxLayout(widgets["head"])
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(widgets["search"])
+        layout.addWidget(widgets["refresh"])
+
         layout = QtWidgets.QVBoxLayout(widgets["side"])
         layout.setContentsMargins(0, 0, 0, 0)
         layout.addWidget(widgets["tab"])
@@ -74,7 +84,7 @@ class PackageBookView(QtWidgets.QWidget):
         layout.setSpacing(0)
 
         layout = QtWidgets.QVBoxLayout(self)
-        layout.addWidget(widgets["search"])
+        layout.addWidget(widgets["head"])
         layout.addSpacing(6)
         layout.addWidget(widgets["book"])
         layout.setSpacing(0)
@@ -85,6 +95,7 @@ class PackageBookView(QtWidgets.QWidget):
 
         widgets["tab"].currentChanged.connect(self.on_tab_clicked)
         widgets["search"].textChanged.connect(self.on_searched)
+        widgets["refresh"].clicked.connect(self.refreshed.emit)
         header.sortIndicatorChanged.connect(self.on_sort_changed)
         scroll.valueChanged.connect(self.on_scrolled)
 
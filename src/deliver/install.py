@@ -3,11 +3,14 @@ import os
 import sys
 import argparse
 import subprocess
+from contextlib import contextmanager
 
 from rez.config import config as rezconfig
 
 from deliver.solve import RequestSolver
 from deliver.lib import clear_repo_cache, temp_env
+from deliver.cache import get_cache_root
+from deliver.git import update_mirror, checkout_worktree
 
 
 class PackageInstaller(RequestSolver):
@@ -19,27 +22,45 @@ class PackageInstaller(RequestSolver):
 
     def run_iter(self):
         deliverconfig = rezconfig.plugins.command.deliver
-
-        for requested in self._requirements:
-            if requested.status != self.Ready:
-                # TODO: prompt warning if the status is `ResolveFailed`
-                continue
-
-            if requested.source == self.loader.maker_source:
-                self._make(requested.name,
-                           variant=requested.index)
+        maker_source = self.loader.maker_source
+
+        # TODO: prompt warning if the status is `ResolveFailed`
+        pending = [r for r in self._requirements.values()
+                   if r.status == self.Ready]
+
+        while pending:
+            requested = pending.pop(0)
+            batch = [requested]
+
+            if requested.source == maker_source:
+                # consecutive variants of same maker package can be made
+                #   together
+                while pending and pending[0].source == maker_source \
+                        and pending[0].name == requested.name \
+                        and requested.index is not None \
+                        and pending[0].index is not None:
+                    batch.append(pending.pop(0))
+
+                if len(batch) > 1:
+                    self._make_variants(requested.name,
+                                        [r.index for r in batch])
+                else:
+                    self._make(requested.name,
+                               variant=requested.index)
             else:
                 self._build(requested.name,
                             os.path.dirname(requested.source),
                             variant=requested.index,
-                            ver_tag=requested.ver_tag)
+                            ver_tag=requested.ver_tag,
+                            git_url=requested.git_url)
 
-            deliverconfig.on_package_deployed_callback(
-                name=requested.name,
-                path=self.deploy_path,
-            )
+            for requested_ in batch:
+                deliverconfig.on_package_deployed_callback(
+                    name=requested_.name,
+                    path=self.deploy_path,
+                )
 
-            yield requested
+                yield requested_
 
     def _make(self, name, variant=None):
         deploy_path = self.deploy_path
@@ -51,7 +72,24 @@ class PackageInstaller(RequestSolver):
 
         clear_repo_cache(deploy_path)
 
-    def _build(self, name, src_dir, variant=None, ver_tag=None):
+    def _make_variants(self, name, variants):
+        made_pkg = self.loader.get_maker_made_package(name)
+        install_variants = getattr(made_pkg, "__install_variants__", None)
+        if install_variants is None:
+            for variant in variants:
+                self._make(name, variant=variant)
+            return
+
+        deploy_path = self.deploy_path
+        if not os.path.isdir(deploy_path):
+            os.makedirs(deploy_path)
+
+        install_variants(deploy_path, variants)
+
+        clear_repo_cache(deploy_path)
+
+    def _build(self, name, src_dir, variant=None, ver_tag=None,
+               git_url=None):
         variant_cmd = [] if variant is None else ["--variants", str(variant)]
         deploy_path = self.deploy_path
 
@@ -71,14 +109,65 @@ class PackageInstaller(RequestSolver):
             env["REZ_LOCAL_PACKAGES_PATH"] = deploy_path
             cmd += ["--install"]
 
+        payload_cache = get_cache_root("payloads")
+        if payload_cache:
+            env["REZ_DELIVER_PAYLOAD_CACHE"] = payload_cache
+            env["REZ_DELIVER_PAYLOAD_FETCH"] = subprocess.list2cmdline(
+                [sys.executable, "-m", "deliver.payload"])
+
         if ver_tag:
             env["__DELIVER_PKG_PAYLOAD_VER"] = ver_tag
 
         cmd += variant_cmd
-        self._run_command(cmd, cwd=src_dir, env=env)
+        with self._git_payload_env(git_url, ver_tag) as payload_env:
+            # payload worktree is locked for this build
+            env.update(payload_env)
+            self._run_command(cmd, cwd=src_dir, env=env)
 
         clear_repo_cache(deploy_path)
 
+    @contextmanager
+    def _git_payload_env(self, git_url, ver_tag):
+        """Context that prepares local mirror and worktree of payload
+
+        Only if `git_payload_cache` is enabled and `cache_root` is set. Build
+        script may use them instead of cloning from `git_url`:
+
+            REZ_DELIVER_PKG_PAYLOAD_MIRROR: bare mirror of `git_url`
+            REZ_DELIVER_PKG_PAYLOAD_WORKTREE: checkout of the tag
+
+        The worktree is locked until the context exits, so the build should
+        run inside of it.
+
+        Yields:
+            dict: Environment variables, empty if not available.
+
+        """
+        deliverconfig = rezconfig.plugins.command.deliver
+        mirror_root = get_cache_root("mirrors")
+        if not (git_url and ver_tag) \
+                or not deliverconfig.git_payload_cache or not mirror_root:
+            yield {}
+            return
+
+        timeout = deliverconfig.git_remote_timeout
+        git_dir = update_mirror(git_url, mirror_root, timeout=timeout)
+        if git_dir is None:
+            yield {}
+            return
+
+        env = {"REZ_DELIVER_PKG_PAYLOAD_MIRROR": git_dir}
+
+        path = os.path.join(get_cache_root("worktrees"),
+                            os.path.basename(git_dir)[:-len(".git")],
+                            ver_tag)
+        with checkout_worktree(git_dir, ver_tag, path,
+                               timeout=timeout) as worktree:
+            if worktree is not None:
+                env["REZ_DELIVER_PKG_PAYLOAD_WORKTREE"] = worktree
+
+            yield env
+
     def _run_command(self, cmd_args, **kwargs):
         print("Running command:\n    %s\n" % cmd_args)
         subprocess.check_call(cmd_args, **kwargs)
@@ -1,49 +1,143 @@
 
 import os
+import ast
 import functools
+import threading
 from contextlib import contextmanager
 from rez.config import config as rezconfig
 from rez.package_repository import package_repository_manager
 
 
+# Working dir, environment and rez config are process-wide, so the scopes
+#   that change them are mutually exclusive between threads. Reentrant for
+#   nested scopes in same thread.
+evaluation_lock = threading.RLock()
+
+_local = threading.local()
+
+# Bumped on each `clear_repo_cache`, i.e. installed packages have changed
+_repo_cache_serial = 0
+
+
+class EvaluationScope(object):
+    """Working dir, env and rez config overrides of an evaluation
+
+    Scopes are stacked per thread, inner scope inherits the overrides from
+    the outer one. See `evaluation_scope`.
+
+    """
+    __slots__ = ("cwd", "env", "config")
+
+    def __init__(self, cwd=None, env=None, config=None):
+        self.cwd = cwd
+        self.env = env or dict()
+        self.config = config or dict()
+
+    def __repr__(self):
+        return "EvaluationScope(cwd=%r, env=%r, config=%r)" \
+               % (self.cwd, self.env, sorted(self.config))
+
+
+def current_scope():
+    """Return current thread's innermost `EvaluationScope`, or None"""
+    stack = getattr(_local, "scopes", None)
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def evaluation_scope(cwd=None, env=None, config=None):
+    """Context for evaluating package or resolving context
+
+    Changes working dir, sets environment variables (or unset if value is
+    None) and overrides rez config, then restores them on exit. The scope
+    is exclusive to current thread while it is active, so loader and solver
+    can be used from multiple threads.
+
+    Args:
+        cwd (str): Working directory, optional.
+        env (dict): Environment variables, optional.
+        config (dict): Rez config overrides, optional.
+
+    Yields:
+        `EvaluationScope`
+
+    """
+    with evaluation_lock:
+        parent = current_scope() or EvaluationScope()
+        scope = EvaluationScope(
+            cwd=cwd or parent.cwd,
+            env=dict(parent.env, **(env or {})),
+            config=dict(parent.config, **(config or {})),
+        )
+        stack = _local.__dict__.setdefault("scopes", [])
+        stack.append(scope)
+        try:
+            with override_config(config or {}), \
+                    _environ(env or {}), \
+                    os_chdir(cwd):
+                yield scope
+        finally:
+            stack.pop()
+
+
+@contextmanager
+def _environ(env):
+    previous = {key: os.environ.get(key) for key in env}
+
+    def apply(entries):
+        for key, value in entries.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    with evaluation_lock:
+        try:
+            apply(env)
+            yield
+        finally:
+            apply(previous)
+
+
 @contextmanager
 def temp_env(key, value):
-    try:
-        if value is None:
-            os.environ.pop(key, None)
-        else:
-            os.environ[key] = value
+    with _environ({key: value}):
         yield
 
-    finally:
-        os.environ.pop(key, None)
-
 
 @contextmanager
 def os_chdir(path):
-    cwd = os.getcwd()
-    try:
-        os.chdir(path)
+    if not path:
         yield
-    finally:
-        os.chdir(cwd)
+        return
+
+    with evaluation_lock:
+        cwd = os.getcwd()
+        try:
+            os.chdir(path)
+            yield
+        finally:
+            os.chdir(cwd)
 
 
 @contextmanager
 def override_config(entries):
-    previous_override = rezconfig.overrides.copy()
+    with evaluation_lock:
+        previous_override = rezconfig.overrides.copy()
 
-    for key, value in entries.items():
-        rezconfig.override(key, value)
+        for key, value in entries.items():
+            rezconfig.override(key, value)
 
-    yield
+        try:
+            yield
 
-    for key in entries.keys():
-        rezconfig.remove_override(key)
+        finally:
+            for key in entries.keys():
+                rezconfig.remove_override(key)
 
-    for key, value in previous_override.items():
-        if key in entries:
-            rezconfig.override(key, value)
+            for key, value in previous_override.items():
+                if key in entries:
+                    rezconfig.override(key, value)
 
 
 def clear_repo_cache(path):
@@ -55,8 +149,15 @@ def clear_repo_cache(path):
     the family list is cached in this session.
 
     """
+    global _repo_cache_serial
     fs_repo = package_repository_manager.get_repository(path)
     fs_repo.get_family.cache_clear()
+    _repo_cache_serial += 1
+
+
+def repo_cache_serial():
+    """Return a number that changes on every `clear_repo_cache` call"""
+    return _repo_cache_serial
 
 
 def expand_path(path):
@@ -69,3 +170,105 @@ def expand_path(path):
     )
 
     return path
+
+
+class _DynamicAttribute(Exception):
+    pass
+
+
+_namespace_writers = {
+    "globals", "locals", "vars", "exec", "eval", "setattr", "scope",
+}
+
+
+def _module_assignments(tree):
+    """Return literal top-level assignments and names assigned otherwise
+
+    Names that are touched in any other way at module level, e.g. being
+    mutated by method call or passed to function, are taken as dynamic.
+
+    """
+    literals = dict()
+    dynamic = set()
+
+    def mark(node):
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            dynamic.add(node.name)
+            for child in ast.walk(node):
+                if isinstance(child, (ast.Global, ast.Nonlocal)):
+                    dynamic.update(child.names)
+                elif isinstance(child, ast.Name) \
+                        and child.id in _namespace_writers:
+                    raise _DynamicAttribute()
+            for decorator in node.decorator_list:
+                mark(decorator)
+            return
+
+        if isinstance(node, ast.Name):
+            if node.id in _namespace_writers:
+                raise _DynamicAttribute()
+            dynamic.add(node.id)
+            return
+
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == "*":
+                    raise _DynamicAttribute()
+                dynamic.add((alias.asname or alias.name).split(".")[0])
+            return
+
+        for child in ast.iter_child_nodes(node):
+            mark(child)
+
+    for node in tree.body:
+        if isinstance(node, ast.Assign) \
+                and len(node.targets) == 1 \
+                and isinstance(node.targets[0], ast.Name):
+            key = node.targets[0].id
+            try:
+                literals[key] = ast.literal_eval(node.value)
+            except ValueError:
+                dynamic.add(key)
+                mark(node.value)
+        else:
+            mark(node)
+
+    return literals, dynamic
+
+
+def read_static_attributes(filepath, keys):
+    """Read package attributes from package.py without evaluating it
+
+    Only attributes that are assigned with literal value at module level
+    can be read, e.g. `tools = ["foo", "bar"]`. Attributes that are never
+    assigned will be missing from the result.
+
+    Args:
+        filepath (str): package.py file path
+        keys (list): Attribute names to read
+
+    Returns:
+        dict: Attributes, or None if any of them is dynamic or evaluation
+            may alter them (e.g. package preprocess).
+
+    """
+    if rezconfig.package_preprocess_function:
+        return None
+
+    try:
+        with open(filepath, "rb") as f:
+            tree = ast.parse(f.read(), filename=filepath)
+    except (IOError, OSError, SyntaxError, ValueError):
+        return None
+
+    try:
+        literals, dynamic = _module_assignments(tree)
+    except _DynamicAttribute:
+        return None
+
+    if "preprocess" in literals or "preprocess" in dynamic:
+        return None
+    if any(key in dynamic for key in keys):
+        return None
+
+    return {key: literals[key] for key in keys if key in literals}
@@ -1,21 +1,30 @@
 from __future__ import absolute_import
 import re
 import os
+import json
+import time
 import shutil
 import subprocess
-from tempfile import mkdtemp
+from tempfile import mkdtemp, gettempdir
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 from rez.util import which
 from rez.system import system
 from rez.utils.lint_helper import env
 from rez.packages import iter_packages
+from rez.package_repository import package_repository_manager
 from rez.config import config as rezconfig
 from rez.resolved_context import ResolvedContext
 from rez.package_maker import PackageMaker, make_package
 from rez.vendor.version.version import Version, VersionError
+from rez.vendor.lockfile import LockFile, LockTimeout
 
+from deliver.lib import expand_path, evaluation_scope
+from deliver.cache import get_cache_root, write_atomic
 
-def fetch_rez_version_from_pypi():
+
+def fetch_rez_version_from_pypi(timeout=None):
     try:
         from urllib.request import urlopen  # noqa, py3
     except ImportError:
@@ -26,9 +35,13 @@ def fetch_rez_version_from_pypi():
     _pypi_url = "https://pypi.python.org/simple/{}".format(name)
     _regex_version = re.compile(".*{}-(.*)\\.tar\\.gz".format(name))
 
-    f = urlopen(_pypi_url)
-    text = f.read().decode("utf-8")
-    f.close()
+    try:
+        f = urlopen(_pypi_url, timeout=timeout)
+        text = f.read().decode("utf-8")
+        f.close()
+    except Exception as e:
+        print("Failed to fetch rez version from PyPi: %s" % str(e))
+        return None
 
     latest_str = ""
     for line in text.split():
@@ -46,12 +59,136 @@ def fetch_rez_version_from_pypi():
     print("Failed to parse latest rez version from PyPi..")
 
 
+_regex_dist_rez_ver = re.compile(
+    r"\brez-([0-9][0-9a-zA-Z_.]*?)(?:\.tar\.gz|\.zip|-py[^/\"\s]*?\.whl)"
+)
+
+
+def find_rez_version_from_index(path):
+    """Find latest rez version from a local index
+
+    Args:
+        path (str): Either a dir that contains rez distribution files (e.g.
+            a wheelhouse), or a file like a saved PyPI simple index page.
+
+    Returns:
+        str: Latest rez version, or None if not found.
+
+    """
+    try:
+        if os.path.isdir(path):
+            text = "\n".join(os.listdir(path))
+        else:
+            with open(path, "r") as f:
+                text = f.read()
+    except (IOError, OSError) as e:
+        print("Failed to read rez version index %s: %s" % (path, str(e)))
+        return None
+
+    versions = []
+    for ver_str in _regex_dist_rez_ver.findall(text):
+        try:
+            versions.append(Version(ver_str))
+        except VersionError:
+            continue
+
+    return str(max(versions)) if versions else None
+
+
+def _read_cached_rez_version(cache_file, ttl):
+    try:
+        with open(cache_file, "r") as f:
+            entry = json.load(f)
+        version = entry["version"]
+        age = time.time() - entry["time"]
+    except Exception:
+        return None, False
+
+    return version, ttl is None or 0 <= age < ttl
+
+
+def get_rez_version():
+    """Return latest rez version for rez maker
+
+    Looked up from `rez_version_index` if configured, otherwise from PyPI
+    unless `pypi_offline` is set. The result is cached under `cache_root`
+    for `rez_version_ttl` seconds, and a stale one is still used if the
+    lookup failed.
+
+    Returns:
+        str: Rez version, or None if not found.
+
+    """
+    deliverconfig = rezconfig.plugins.command.deliver
+    cache_file = get_cache_root("rez_version.json")
+
+    cached, fresh = None, False
+    if cache_file:
+        cached, fresh = _read_cached_rez_version(
+            cache_file, deliverconfig.rez_version_ttl)
+    if fresh:
+        return cached
+
+    version = None
+    if deliverconfig.rez_version_index:
+        index = expand_path(deliverconfig.rez_version_index)
+        version = find_rez_version_from_index(index)
+
+    if version is None and not deliverconfig.pypi_offline:
+        version = fetch_rez_version_from_pypi(
+            timeout=deliverconfig.pypi_timeout)
+
+    if version is None:
+        return cached
+
+    if cache_file:
+        entry = {"version": version, "time": time.time()}
+        try:
+            write_atomic(cache_file, json.dumps(entry).encode("utf-8"))
+        except (IOError, OSError) as e:
+            print("Failed to write rez version cache: %s" % str(e))
+
+    return version
+
+
 _regex_pypi_rez_ver = re.compile('.*<h1 class="package-header__name">'
                                  '.*rez ([0-9]+.[0-9]+.[0-9]+).*',
                                  flags=re.DOTALL)
 
 
+# path set -> (repository stamp, python major.minor versions)
+_python_versions_index = dict()
+
+
+def _python_family_stamp(paths):
+    stamp = []
+    for path in paths:
+        if path.startswith("memory@"):
+            # developer repository mounted in memory repository
+            path = path[len("memory@"):]
+        try:
+            st = os.stat(os.path.join(path, "python"))
+        except OSError:
+            stamp.append(None)
+        else:
+            stamp.append(st.st_mtime_ns)
+    return tuple(stamp)
+
+
 def find_python_package_versions(release):
+    """Return python major.minor versions found in package paths
+
+    The result is memoized for each path set, and only re-computed when
+    python family dir in any of the paths has been changed, which is when
+    a version got added or removed.
+
+    Args:
+        release (bool): Look into non-local packages paths only
+
+    Returns:
+        list: Sorted major.minor version strings
+
+    """
     from deliver.api import PackageLoader
 
     python = "python"
@@ -63,6 +200,19 @@ def find_python_package_versions(release):
         else rezconfig.packages_path[:]
     paths += loader.paths
 
+    key = tuple(paths)
+    stamp = _python_family_stamp(paths)
+    cached = _python_versions_index.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1][:]
+
+    if cached is not None:
+        # let filesystem repositories see the change
+        for path in paths:
+            if os.path.isdir(path):
+                repo = package_repository_manager.get_repository(path)
+                repo.clear_caches()
+
     for package in iter_packages(python, paths=paths):
         versions.add(package.version)
 
@@ -74,11 +224,14 @@ def find_python_package_versions(release):
         if len(tokens) >= 2 and all(t.isdigit() for t in tokens):
             short_versions.add(".".join(tokens))
 
-    return sorted(short_versions)
+    short_versions = sorted(short_versions)
+    _python_versions_index[key] = (stamp, short_versions)
+
+    return short_versions[:]
 
 
 def pkg_rez(release, *_args, **_kwargs):
-    version = fetch_rez_version_from_pypi()
+    version = get_rez_version()
     gui_version = version or "2"
     pip_version = ("==%s" % version) if version else ">=2"
 
@@ -91,10 +244,15 @@ def pkg_rez(release, *_args, **_kwargs):
             variant.append("python-" + py_ver)
             variants.append(variant)
 
-        def install_rez_via_pip(repo_path, variant_index, *_args, **_kwargs):
+        def resolve_build_context(variant_index):
+            # rez config is read throughout the solve
+            with evaluation_scope():
+                return ResolvedContext(variants[variant_index], building=True)
+
+        def install_rez_via_pip(repo_path, variant_index, *_args,
+                                log=None, context=None, **_kwargs):
             py_version = pythons[variant_index]
-            requires = variants[variant_index]
-            context = ResolvedContext(requires, building=True)
+            context = context or resolve_build_context(variant_index)
 
             _exec = context.which("_deliver_mk")
             if not _exec:
@@ -102,7 +260,9 @@ def pkg_rez(release, *_args, **_kwargs):
                                 "within package building context, possible "
                                 "not a production install ?")
 
-            context.execute_shell(
+            output = {} if log is None \
+                else {"stdout": log, "stderr": subprocess.STDOUT}
+            returncode, _, _ = context.execute_shell(
                 command=[_exec,
                          "-n", "rez",
                          "-p", repo_path,
@@ -111,6 +271,33 @@ def pkg_rez(release, *_args, **_kwargs):
                          gui_version,
                          py_version],
                 block=True,
+                **output
+            )
+            if log is not None and returncode:
+                raise Exception("Failed to install rez for python-%s, see "
+                                "log: %s" % (py_version, log.name))
+
+        def install_rez_variants(repo_path, variant_indices, *_args,
+                                 **_kwargs):
+            # solve in serial, only the pip install runs concurrently
+            contexts = {
+                index: resolve_build_context(index)
+                for index in variant_indices
+            }
+
+            def install(repo_path_, variant_index, log=None):
+                install_rez_via_pip(repo_path_, variant_index,
+                                    log=log,
+                                    context=contexts[variant_index])
+
+            install_variants_in_parallel(
+                install,
+                repo_path,
+                variant_indices,
+                log_names=[
+                    "rez-%s-python-%s" % (gui_version, pythons[i])
+                    for i in variant_indices
+                ],
             )
 
     else:
@@ -128,41 +315,188 @@ def pkg_rez(release, *_args, **_kwargs):
     maker.version = gui_version
     maker.variants = variants
     maker.__install__ = install_rez_via_pip
+    if pythons:
+        maker.__install_variants__ = install_rez_variants
 
     return maker
 
 
+def install_variants_in_parallel(install, repo_path, variant_indices,
+                                 log_names):
+    """Install multiple variants of maker package concurrently
+
+    At most `maker_variant_processes` variants are installed at the same
+    time, each one's output is written into its own log file under
+    `cache_root` (or temp dir).
+
+    Args:
+        install (callable): Maker's `__install__` that accepts `log` file
+        repo_path (str): Path to install to
+        variant_indices (list): Variant indices
+        log_names (list): Log file name of each variant, without extension
+
+    Returns:
+        None
+
+    """
+    deliverconfig = rezconfig.plugins.command.deliver
+    workers = max(1, min(deliverconfig.maker_variant_processes or 1,
+                         len(variant_indices)))
+    log_dir = _ensure_dir(get_cache_root("logs")
+                          or os.path.join(gettempdir(), "deliver-logs"))
+
+    def install_one(index, log_name):
+        log_file = os.path.join(log_dir, log_name + ".log")
+        print("Installing variant %d, log: %s" % (index, log_file))
+        with open(log_file, "w") as log:
+            install(repo_path, index, log=log)
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(install_one, index, log_name)
+            for index, log_name in zip(variant_indices, log_names)
+        ]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(str(e))
+                errors.append(e)
+
+    if errors:
+        raise errors[0]
+
+
 def build_rez_via_pip(repo_path, rez_url, rez_version, python_version=None):
-    # pip install rez to temp
-    tmpdir = mkdtemp(prefix="rez-install-")
     python_exec = which("python")
+    cache_dir = _pip_tree_cache_dir(rez_url, rez_version, python_exec)
 
-    subprocess.check_call(
-        [python_exec, "-m", "pip", "install", rez_url, "--target", tmpdir],
-        stderr=subprocess.STDOUT,
-    )
+    if cache_dir and os.path.isdir(cache_dir):
+        print("Using cached rez install: %s" % cache_dir)
+        source = cache_dir
+        tmpdir = None
+    else:
+        # pip install rez to temp
+        tmpdir = mkdtemp(prefix=".tmp-rez-install-",
+                         dir=_ensure_dir(os.path.dirname(cache_dir))
+                         if cache_dir else None)
+        subprocess.check_call(
+            [python_exec, "-m", "pip", "install", rez_url,
+             "--target", tmpdir] + _pip_index_args(),
+            stderr=subprocess.STDOUT,
+        )
+        source = tmpdir
+
+        if cache_dir:
+            try:
+                os.rename(tmpdir, cache_dir)
+            except OSError:
+                # cached by other build in the meantime
+                pass
+            else:
+                tmpdir = None
+            source = cache_dir
 
     # make package
     def commands():
         env.PYTHONPATH.append("{this.root}")
 
+    # hardlinks would let changes made in released package (e.g. chmod)
+    #   leak into the cache and every other deployment
+    release_path = expand_path(rezconfig.release_packages_path)
+    if expand_path(repo_path) == release_path:
+        copy_function = shutil.copy2
+    else:
+        copy_function = _link_or_copy
+
     def make_root(_variant, root):
         for lib in ["rez", "rezplugins"]:
-            shutil.copytree(os.path.join(tmpdir, lib),
-                            os.path.join(root, lib))
+            shutil.copytree(os.path.join(source, lib),
+                            os.path.join(root, lib),
+                            copy_function=copy_function)
 
     variant = system.variant[:]
     if python_version:
         variant.append("python-%s" % python_version)
     variants = [variant]
 
-    with make_package("rez", repo_path, make_root=make_root) as pkg:
+    # variants may be built concurrently into the same package version
+    with _package_lock(repo_path, "rez", rez_version), \
+            make_package("rez", repo_path, make_root=make_root) as pkg:
         pkg.version = rez_version
         pkg.variants = variants
         pkg.commands = commands
 
     # cleanup
+    if tmpdir:
+        try:
+            shutil.rmtree(tmpdir)
+        except Exception:
+            pass
+
+
+def _pip_index_args():
+    deliverconfig = rezconfig.plugins.command.deliver
+    args = []
+    if deliverconfig.rez_wheelhouse:
+        args += ["--find-links", expand_path(deliverconfig.rez_wheelhouse)]
+    if deliverconfig.pypi_offline:
+        args += ["--no-index"]
+    return args
+
+
+def _pip_tree_cache_dir(rez_url, rez_version, python_exec):
+    """Return cache dir of pip installed rez, or None if not cacheable
+
+    Only pinned rez version is cacheable, and is keyed by rez version and
+    the major.minor version of python that runs pip.
+
+    """
+    if rez_url != "rez==%s" % rez_version:
+        return None
+
+    cache_root = get_cache_root("rez_pip")
+    if not cache_root:
+        return None
+
     try:
-        shutil.rmtree(tmpdir)
-    except Exception:
-        pass
+        py_ver = subprocess.check_output(
+            [python_exec, "-c",
+             "import sys;print('%d.%d' % sys.version_info[:2])"],
+            universal_newlines=True,
+        ).strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+    return os.path.join(cache_root, "rez-%s-py%s" % (rez_version, py_ver))
+
+
+@contextmanager
+def _package_lock(repo_path, name, version, timeout=600):
+    """Lock one package version in repository across processes"""
+    family_path = _ensure_dir(os.path.join(repo_path, name))
+    lock = LockFile(os.path.join(family_path, ".deliver-%s" % version))
+    try:
+        lock.acquire(timeout=timeout)
+    except LockTimeout:
+        raise Exception("Timed out waiting for other install of %s-%s: %s"
+                        % (name, version, lock.lock_file))
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def _ensure_dir(path):
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    return path
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
@@ -0,0 +1,73 @@
+
+import os
+import sys
+import argparse
+
+from rez.config import config as rezconfig
+
+from deliver.cache import PayloadCache
+from deliver.exceptions import RezDeliverPayloadError
+
+
+def fetch(url, sha256=None):
+    """Get payload archive from deliver's payload cache
+
+    Args:
+        url (str): Archive url, file:// is supported.
+        sha256 (str): Expected checksum, optional.
+
+    Returns:
+        str: Path of the cached archive
+
+    """
+    return _payload_cache().fetch(url, sha256=sha256)
+
+
+def extract(url, dest, sha256=None):
+    """Extract payload archive into dest dir through deliver's payload cache
+
+    Args:
+        url (str): Archive url, file:// is supported.
+        dest (str): Dir path to extract to, e.g. build dir
+        sha256 (str): Expected checksum, optional.
+
+    Returns:
+        str: The dest dir path
+
+    """
+    return _payload_cache().extract(url, dest, sha256=sha256)
+
+
+def _payload_cache():
+    # set by `PackageInstaller` for build scripts
+    root = os.getenv("REZ_DELIVER_PAYLOAD_CACHE")
+    if not root:
+        return PayloadCache.from_config()
+
+    deliverconfig = rezconfig.plugins.command.deliver
+    return PayloadCache(root=root, timeout=deliverconfig.download_timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser("deliver.payload")
+    parser.add_argument("URL")
+    parser.add_argument("DEST", nargs="?",
+                        help="Extract archive into this dir. If not given, "
+                             "print out the cached archive path.")
+    parser.add_argument("--sha256")
+    opts = parser.parse_args()
+
+    try:
+        if opts.DEST:
+            extract(opts.URL, os.path.abspath(opts.DEST), sha256=opts.sha256)
+        else:
+            print(fetch(opts.URL, sha256=opts.sha256))
+    except RezDeliverPayloadError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,47 @@
 
 import os
+import re
+import atexit
 import logging
-import subprocess
-from functools import wraps
+import itertools
+import multiprocessing
+from functools import wraps, partial
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 
 from rez.config import config as rezconfig
 from rez.developer_package import DeveloperPackage
 from rez.utils.logging_ import logger as rez_logger
-from rez.vendor.version.version import Version, VersionError
+from rez.vendor.version.version import VersionError
 from rez.package_repository import package_repository_manager
 from rez.packages import (
     iter_package_families,
     iter_packages,
     get_latest_package,
     get_latest_package_from_string,
+    get_package_family_from_repository,
 )
 
-from deliver.lib import expand_path, override_config, temp_env, os_chdir
+from deliver.lib import (
+    expand_path,
+    override_config,
+    evaluation_scope,
+    evaluation_lock,
+    read_static_attributes,
+)
+from deliver.cache import (
+    get_cache_root,
+    PackageDataCache,
+    TagCache,
+    LoadedCache,
+    interner,
+    use_code_cache,
+    use_subprocess_memo,
+    subprocess_memo,
+)
+from deliver.exceptions import RezDeliverEvaluationError
+from deliver.watch import create_watcher
+from deliver.git import fetch_remote_tags, select_tags
 from deliver.maker.os import pkg_os
 from deliver.maker.arch import pkg_arch
 from deliver.maker.platform import pkg_platform
@@ -27,20 +52,32 @@ from deliver.maker.rez import pkg_rez
 rez_logger.setLevel(logging.WARNING)
 
 
+# Unique across repository instances, so a reloaded one never reuses a serial
+_repo_serials = itertools.count()
+
+
 def _with_loader_config(fn):
     @wraps(fn)
     def decorated(self, *args, **kwargs):
-        with override_config(self.settings):
+        with evaluation_scope(config=self.settings):
             return fn(self, *args, **kwargs)
     return decorated
 
 
 def _iter_with_loader_config(fn):
+    # The scope is entered for producing each item, and exited before the
+    #   item is yielded, so a paused iteration doesn't hold the evaluation
+    #   lock, and can be resumed from another thread.
     @wraps(fn)
     def decorated(self, *args, **kwargs):
-        with override_config(self.settings):
-            for item in fn(self, *args, **kwargs):
-                yield item
+        items = fn(self, *args, **kwargs)
+        while True:
+            with evaluation_scope(config=self.settings):
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+            yield item
     return decorated
 
 
@@ -134,15 +171,119 @@ class PackageLoader(object):
             `Package`: latest package in requested range, None if not found.
 
         """
-        return get_latest_package(name=request.name,
-                                  range_=request.range_,
-                                  paths=self.paths)
+        while True:
+            package = get_latest_package(name=request.name,
+                                         range_=request.range_,
+                                         paths=self.paths)
+            if package is None or package.data:
+                return package
+            # lazy version that failed to evaluate has been dropped, retry
+
+    @_with_loader_config
+    def preload(self):
+        """Evaluate all developer packages that are not yet loaded
+
+        Families are evaluated in parallel by a pool of worker processes if
+        `evaluation_processes` is set in deliver config, otherwise this does
+        nothing and packages will be evaluated on demand.
+
+        """
+        for repo in self._dev_repos:
+            repo.preload()
+
+    def watch(self):
+        """Start watching developer repositories for package changes
+
+        Changes are collected and applied on `poll_changes()`. Linux inotify
+        is used if available, otherwise file stats are compared on poll.
+
+        """
+        for repo in self._dev_repos:
+            repo.watch()
+
+    def unwatch(self):
+        for repo in self._dev_repos:
+            repo.unwatch()
+
+    @_with_loader_config
+    def poll_changes(self):
+        """Re-evaluate developer package families that have been changed
+
+        Only works after `watch()` is called.
+
+        Returns:
+            list: Names of changed families, include removed ones.
+
+        """
+        changed = []
+        for repo in self._dev_repos:
+            for name in repo.poll_changes():
+                if name not in changed:
+                    changed.append(name)
+        return changed
+
+    def refresh_git_tags(self):
+        """Re-list git tags from remotes on next query, bypass tag cache"""
+        for repo in self._dev_repos:
+            repo.refresh_git_tags()
+
+    def cache_stats(self):
+        """Return loaded package cache statistics of each repository
+
+        Returns:
+            dict: Repository root as key and `Repo.cache_stats` as value
+
+        """
+        return {repo.root: repo.cache_stats() for repo in self._dev_repos}
+
+    def state(self):
+        """Return a token that changes whenever loaded packages may change
+
+        Returns:
+            tuple: Serial number of each repository
+
+        """
+        return tuple(repo.serial for repo in self._dev_repos)
+
+    def evaluation_failures(self):
+        """Return developer packages that failed to evaluate
+
+        E.g. evaluation timed out (see `evaluation_timeout` in config), or
+        lazily evaluated git tag didn't match its listed version.
+
+        Returns:
+            list: Failure messages
+
+        """
+        failures = []
+        for repo in self._dev_repos:
+            failures += repo.evaluation_failures()
+        return failures
 
     @_iter_with_loader_config
     def iter_package_families(self):
+        self.preload()
         for family in iter_package_families(paths=self.paths):
             yield family
 
+    @_iter_with_loader_config
+    def iter_package_summaries(self, names=None):
+        """Iterate listing attributes of all developer packages
+
+        Unlike `iter_package_families`, package.py will only be evaluated if
+        listing attributes cannot be read from it statically.
+
+        Args:
+            names (list): Only iterate these package families, optional.
+
+        Yields:
+            dict: Package summary, see `Repo.iter_package_summaries`
+
+        """
+        for repo in self._dev_repos:
+            for summary in repo.iter_package_summaries(names=names):
+                yield summary
+
     @_iter_with_loader_config
     def iter_packages(self, name, range_=None):
         for package in iter_packages(name, range_=range_, paths=self.paths):
@@ -156,6 +297,9 @@ class PackageLoader(object):
                     yield name
                 seen.add(name)
 
+    def _get_repo(self, root):
+        return next((r for r in self._dev_repos if r.root == root), None)
+
 
 class Repo(object):
     """Base class of developer package repository, internal used."""
@@ -172,11 +316,25 @@ class Repo(object):
         # Mount self to memory repository, so the package only gets
         #   evaluated when asked. The evaluation happens in family
         #   level, which means all versions will be loaded once the
-        #   family is being asked. Also, evaluated versions will be
-        #   cached.
+        #   family is being asked, unless `lazy_evaluation` is enabled.
+        #   Also, evaluated versions will be cached, up to
+        #   `max_loaded_families` families.
+        #
+        deliverconfig = rezconfig.plugins.command.deliver
+        self._loaded_cache = LoadedCache(
+            max_families=deliverconfig.max_loaded_families,
+            on_evict=self._on_evicted,
+        )
+        # Names of families that are not in this repository. Mostly those
+        #   external ones like 'python', which will be asked over and over
+        #   again by the solver. Only invalidated when repository changed.
         #
-        self._loaded_cache = dict()
+        self._missing = set()
+        self._missing_stamp = None
+        self._serial = next(_repo_serials)
         self.mem_repo.data = self
+        # resources of previous loader's data may still be cached
+        self.mem_repo.clear_caches()
 
     @property
     def mem_uid(self):
@@ -190,12 +348,104 @@ class Repo(object):
     def root(self):
         return self._root
 
+    @property
+    def serial(self):
+        """A number that changes on every `invalidate`"""
+        return self._serial
+
+    def preload(self):
+        pass
+
+    def watch(self):
+        pass
+
+    def unwatch(self):
+        pass
+
+    def poll_changes(self):
+        return []
+
+    def refresh_git_tags(self):
+        pass
+
+    def invalidate(self, names=None):
+        """Evict loaded families so they will be re-evaluated on next query
+
+        Args:
+            names (list): Family names, evict all if not given.
+
+        Returns:
+            None
+
+        """
+        names = list(self._loaded_cache) if names is None else names
+        for name in names:
+            self._loaded_cache.pop(name, None)
+        self._missing.clear()
+        self._serial = next(_repo_serials)
+        # memory repository resources may still hold evaluated data
+        self.mem_repo.clear_caches()
+
+    def cache_stats(self):
+        """Return loaded package cache statistics
+
+        Returns:
+            dict: With keys `families`, `max_families`, `hits`, `misses`
+                and `evictions`.
+
+        """
+        return self._loaded_cache.stats()
+
+    def evaluation_failures(self):
+        return []
+
+    def _on_evicted(self, names):
+        # memory repository resources may still hold evicted data
+        self.mem_repo.clear_caches()
+
     def iter_dev_packages(self):
         raise NotImplementedError
 
     def get_dev_package_versions(self, name):
         raise NotImplementedError
 
+    def iter_package_summaries(self, names=None):
+        """Iterate package attributes for listing
+
+        Args:
+            names (list): Only iterate these package families, optional.
+
+        Yields:
+            dict: With keys `name`, `version`, `qualified_name`, `uri`,
+                `location`, `tools`, `num_variants` and `description`.
+
+        """
+        if names is None:
+            for name, versions in self.iter_dev_packages():
+                for version, data in versions.items():
+                    yield self._summarize(name, data)
+            return
+
+        for name in names:
+            if not self._has_package(name):
+                continue
+            for version, data in list(self.get_dev_package_versions(name)):
+                yield self._summarize(name, data)
+
+    def _summarize(self, name, data, uri=None):
+        version = data.get("version")
+        version = str(version) if version else ""
+        return {
+            "name": name,
+            "version": version,
+            "qualified_name": (name + "-" + version) if version else name,
+            "uri": uri or data.get("__source__") or self.mem_uid,
+            "location": self._root,
+            "tools": list(data.get("tools") or []),
+            "num_variants": len(data.get("variants") or []),
+            "description": data.get("description") or "",
+        }
+
     def iter_package_family_names(self):
         raise NotImplementedError
 
@@ -203,6 +453,9 @@ class Repo(object):
     #   developer packages.
     #
     def __getitem__(self, name):
+        if not self._has_package(name):
+            return {}
+
         with override_config({"allow_unversioned_packages": True}):
             return {
                 version: data for version, data
@@ -212,12 +465,14 @@ class Repo(object):
     def __contains__(self, pkg):
         if isinstance(pkg, str):
             # querying from memory repository
-            return self.has_package(pkg)
+            return self._has_package(pkg)
         else:
             uid = "@".join(pkg.parent.repository.uid[:2])
             return uid == self.mem_uid
 
     def get(self, key, default=None):
+        if not self._has_package(key):
+            return default
         return self.__getitem__(key) or default
 
     def keys(self):
@@ -226,6 +481,23 @@ class Repo(object):
     def has_package(self, name):
         raise NotImplementedError
 
+    def _stamp(self):
+        """Return a value that changes when families are added or removed"""
+        return None
+
+    def _has_package(self, name):
+        stamp = self._stamp()
+        if stamp != self._missing_stamp:
+            # repository changed, misses may be found now
+            self._missing.clear()
+            self._missing_stamp = stamp
+        if name in self._missing:
+            return False
+        if self.has_package(name):
+            return True
+        self._missing.add(name)
+        return False
+
 
 class MakePkgRepo(Repo):
     """A set of pre-defined package-maker generated packages, like rez-bind"""
@@ -247,10 +519,8 @@ class MakePkgRepo(Repo):
 
     def iter_dev_packages(self):
         for name in self.makers:
-            if name in self._loaded_cache:
-                versions = self._loaded_cache[name]
-
-            else:
+            versions = self._loaded_cache.get(name)
+            if versions is None:
                 package = self._make_package(name)
                 data = package.data
                 version = data.get("version", "_NO_VERSION")
@@ -260,8 +530,8 @@ class MakePkgRepo(Repo):
             yield name, versions
 
     def get_dev_package_versions(self, name):
-        if name in self._loaded_cache:
-            versions = self._loaded_cache[name]
+        versions = self._loaded_cache.get(name)
+        if versions is not None:
             for version, data in versions.items():
                 yield version, data
 
@@ -325,119 +595,732 @@ class DevPkgRepo(Repo):
     """
     def __init__(self, root, loader):
         Repo.__init__(self, root=root, loader=loader)
-        self._seen_cache = dict()
+        self._data_cache = PackageDataCache.from_config()
+        self._family_index = dict()  # family name -> family path
+        self._index_stamp = None
+        self._watcher = None
+        self._remote_tags = dict()  # git url -> tag names
+        self._tag_cache = TagCache.from_config()
+        # urls re-listed since `refresh_git_tags`, None if not refreshing
+        self._refreshed_urls = None
+        self._mirror_root = get_cache_root("mirrors") \
+            if rezconfig.plugins.command.deliver.git_tag_mirrors else None
+        # (filepath, ver_tag) -> (package.py stamp, message)
+        self._failures = dict()
+        self._worker_failed = set()  # family names failed in preload
 
     def has_package(self, name):
-        existence = self._seen_cache.get(name)
-        if existence is None:
-            for family in self.iter_package_family_names():
-                if name == family:
-                    existence = True
-                    break
-            self._seen_cache[name] = existence or False
+        return name in self._get_family_index()
 
-        return existence
+    def _stamp(self):
+        try:
+            return os.stat(self._root).st_mtime_ns
+        except OSError:
+            return None
 
-    def iter_dev_packages(self):
-        for family in iter_package_families(paths=[self._root]):
-            name = family.name  # package dir name
+    def preload(self):
+        deliverconfig = rezconfig.plugins.command.deliver
+        processes = deliverconfig.evaluation_processes or 0
 
-            if name in self._loaded_cache:
-                versions = self._loaded_cache[name]
+        names = [
+            name for name in self.iter_package_family_names()
+            if name not in self._loaded_cache
+            and name not in self._worker_failed
+        ]
+        self.prefetch_git_tags(names)
 
-            else:
-                versions = dict()
-                for version, data in self._generate_dev_packages(family):
-                    versions[version] = data
-                self._loaded_cache[name] = versions
+        if deliverconfig.lazy_evaluation:
+            # versions are evaluated on demand, workers would evaluate all
+            #   of them and replace the lazy entries
+            return
+        if processes < 2 or len(names) < 2:
+            return
+
+        release = self._loader.release
+        # workers are spawned instead of forked, since git tags may be
+        #   revalidated in background threads, config overrides made in this
+        #   process must be passed
+        overrides = rezconfig.overrides.copy()
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=processes,
+                                 mp_context=context) as executor:
+            futures = [
+                (name, executor.submit(_load_family_in_worker,
+                                       self._root, name, release,
+                                       self._remote_tags, overrides))
+                for name in names
+            ]
+            for name, future in futures:
+                try:
+                    versions, failures = future.result()
+                except Exception as e:
+                    # leave it to be evaluated (and raise) on demand, and
+                    #   not to be retried in worker until it changed
+                    print("Failed to load package family [%s] in worker: %s"
+                          % (name, str(e)))
+                    self._worker_failed.add(name)
+                    continue
+                self._failures.update(failures)
+                if versions is not None:
+                    self._loaded_cache[name] = versions
+
+    def prefetch_git_tags(self, names):
+        """List git tags of given families' remotes concurrently
+
+        Only `git_url` that is assigned with literal string in package.py
+        can be collected, others will be listed on demand.
+
+        Args:
+            names (list): Family names
+
+        Returns:
+            None
+
+        """
+        self._resolve_git_tags(self._iter_static_git_urls(names))
+
+    def refresh_git_tags(self):
+        """Re-list git tags from remotes, bypassing the tag cache
+
+        All loaded families are evicted, so they will be re-evaluated with
+        new tags on next query.
+
+        """
+        self._refreshed_urls = set()
+        self.invalidate()
+
+    def _resolve_git_tags(self, urls):
+        """Get tags of git remotes from tag cache or list them concurrently
+
+        Cached tags are served even if they are stale, and those stale ones
+        get revalidated in background.
+
+        Args:
+            urls (iterable): Git remote urls
+
+        Returns:
+            None
+
+        """
+        deliverconfig = rezconfig.plugins.command.deliver
+        workers = deliverconfig.git_remote_workers
+        timeout = deliverconfig.git_remote_timeout
+
+        fetching = []
+        stale = []
+        for url in urls:
+            if url in self._remote_tags or url in fetching:
+                continue
+
+            refreshing = self._refreshed_urls is not None \
+                and url not in self._refreshed_urls
+            tags, fresh = (None, False) if refreshing \
+                else self._tag_cache.get(url)
+            if tags is None:
+                fetching.append(url)
+                continue
+
+            self._remote_tags[url] = tags
+            if not fresh:
+                stale.append(url)
+
+        if fetching:
+            fetched = fetch_remote_tags(fetching, workers, timeout,
+                                        mirror_root=self._mirror_root)
+            for url, tags in fetched.items():
+                self._tag_cache.put(url, tags)
+            self._remote_tags.update(fetched)
+            if self._refreshed_urls is not None:
+                # refresh applied, tag cache is good to use again
+                self._refreshed_urls.update(fetching)
+
+        if stale:
+            self._tag_cache.revalidate(stale, workers, timeout,
+                                       mirror_root=self._mirror_root)
+
+    def _iter_static_git_urls(self, names):
+        for name in names:
+            family = self._get_family(name)
+            if family is None:
+                continue
+
+            for package in family.iter_packages():
+                filepath = package.uri
+                if not filepath or not _may_have_git_url(filepath):
+                    continue
+
+                data = read_static_attributes(filepath, ["git_url"])
+                git_url = (data or {}).get("git_url")
+                if git_url and isinstance(git_url, str):
+                    yield git_url
+
+    def watch(self):
+        if self._watcher is None:
+            self._watcher = create_watcher(self._root)
+
+    def unwatch(self):
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+    def poll_changes(self):
+        if self._watcher is None:
+            return []
+
+        changed = sorted(self._watcher.poll())
+        if not changed:
+            return changed
+
+        self.invalidate(changed)
+        # re-evaluate
+        for name in changed:
+            self._load_family(name)
+
+        return changed
+
+    def invalidate(self, names=None):
+        # family dirs may have new or removed version dirs
+        fs_repo = package_repository_manager.get_repository(self._root)
+        fs_repo.clear_caches()
+        if names is None:
+            self._remote_tags.clear()
+            self._failures.clear()
+            self._worker_failed.clear()
+        else:
+            self._worker_failed.difference_update(names)
+        subprocess_memo.clear()
+        # worker may hold stale state of changed packages
+        _watchdog.close()
+        Repo.invalidate(self, names)
+
+    def evaluation_failures(self):
+        return [message for _, message in self._failures.values()]
+
+    def iter_dev_packages(self):
+        self.preload()
+        for name in self.iter_package_family_names():
+            versions = self._load_family(name)
+            if versions is None:
+                continue
 
             yield name, versions
 
     def get_dev_package_versions(self, name):
-        if name in self._loaded_cache:
-            versions = self._loaded_cache[name]
-            for version, data in versions.items():
-                yield version, data
+        versions = self._load_family(name)
+        if versions is None:
+            return
+
+        for version, data in versions.items():
+            yield version, data
+
+    def iter_package_summaries(self, names=None):
+        listing_keys = ["name", "version", "tools", "variants", "description",
+                        "git_url"]
+
+        for name in self.iter_package_family_names():
+            if names is not None and name not in names:
+                continue
+            versions = self._loaded_cache.get(name)
+            if isinstance(versions, dict):
+                # already evaluated
+                for data in versions.values():
+                    yield self._summarize(name, data)
+                continue
+
+            family = self._get_family(name)
+            if family is None:
+                continue
 
+            for package in family.iter_packages():
+                if not package.uri:
+                    continue
+
+                filepath = package.uri
+                data = read_static_attributes(filepath, listing_keys)
+                if data is None or "git_url" in data or "name" not in data:
+                    with override_config({"allow_unversioned_packages": True}):
+                        evaluated = list(self._iter_evaluated_data(filepath))
+                    for data in evaluated:
+                        yield self._summarize(name, data)
+                else:
+                    yield self._summarize(name, data, uri=filepath)
+
+    def _iter_evaluated_data(self, filepath):
+        deliverconfig = rezconfig.plugins.command.deliver
+        if deliverconfig.lazy_evaluation:
+            # git tag stubs are good enough for listing
+            for _, data, _ in self._lazy_from_file(filepath):
+                yield data
         else:
-            it = iter_package_families(paths=[self._root])
-            family = next((f for f in it if f.name == name), None)
+            for _, data in self._generate_from_file(filepath):
+                yield data
+
+    def __getitem__(self, name):
+        if not self._has_package(name):
+            return {}
+
+        with override_config({"allow_unversioned_packages": True}):
+            # returning cached versions as-is so lazy ones stay unevaluated
+            return self._load_family(name) or {}
+
+    def iter_package_family_names(self):
+        for name in list(self._get_family_index()):
+            yield name
+
+    def _get_family(self, name):
+        if name not in self._get_family_index():
+            return None
+        return get_package_family_from_repository(name, self._root)
+
+    def _load_family(self, name):
+        """Return versions of the family, evaluate and cache if not loaded
+
+        If `lazy_evaluation` is enabled in deliver config, versions that can
+        be told by version dir name will be evaluated on first access.
+
+        Returns:
+            dict: Version string as key and package data as value, or None
+                if family not found.
+
+        """
+        versions = self._loaded_cache.get(name)
+        if versions is not None:
+            return versions
+
+        with evaluation_lock:
+            if name in self._loaded_cache:
+                # loaded by other thread
+                return self._loaded_cache[name]
+
+            family = self._get_family(name)
             if family is None:
-                return
+                return None
 
-            versions = dict()
-            for version, data in self._generate_dev_packages(family):
-                versions[version] = data
-                yield version, data
+            deliverconfig = rezconfig.plugins.command.deliver
+            if deliverconfig.lazy_evaluation:
+                versions = self._lazy_dev_packages(family)
+            else:
+                versions = dict(self._generate_dev_packages(family))
 
             self._loaded_cache[name] = versions
+            return versions
 
-    def iter_package_family_names(self):
-        for family in iter_package_families(paths=[self._root]):
-            yield family.name  # package dir name
+    def _lazy_dev_packages(self, family):
+        versions = _LazyVersions(on_dropped=self._on_evicted)
+        for package in family.iter_packages():
+            if not package.uri:  # A sub-dir in Family dir without package file
+                continue
+
+            filepath = package.uri
+            if package.version and not _may_have_git_url(filepath):
+                # version told by dir name
+                load = partial(self._evaluate_or_report, filepath)
+                versions.add(str(package.version), load)
+            else:
+                for version, data, load in self._lazy_from_file(filepath):
+                    if load is None:
+                        versions.add(version, data=data)
+                    else:
+                        versions.add(version, load)
+
+        return versions
+
+    def _lazy_from_file(self, filepath):
+        """Generate versions from file, with stubs for older git tags
+
+        Only the latest git tag gets evaluated, other versions are derived
+        from it by substituting the tag in version string, and will only be
+        evaluated on first access. If the version string does not contain
+        the tag exactly once, all tags are evaluated like usual.
+
+        Yields:
+            tuple: Version string, package data and the loader. The data is
+                a stub copied from latest tag if loader is not None.
+
+        """
+        data = self._evaluate_or_report(filepath)
+        if data is None:
+            return
+        git_url = data.get("git_url")
+
+        if not git_url:
+            yield data.get("version", "_NO_VERSION"), data, None
+            return
+
+        ver_tags = self._sorted_versions_from_remote(
+            git_url, data.get("git_tag_policy"))
+        if not ver_tags:
+            return
+
+        latest = ver_tags[-1]
+        data = self._evaluate_or_report(filepath, ver_tag=latest)
+        if data is None:
+            return
+        version = str(data.get("version", "_NO_VERSION"))
+        yield version, data, None
+
+        if version.count(latest) != 1:
+            template = None
+        else:
+            template = version.replace(latest, "{tag}")
+
+        for ver_tag in reversed(ver_tags[:-1]):
+            if template is None:
+                tag_data = self._evaluate_or_report(filepath, ver_tag=ver_tag)
+                if tag_data is None:
+                    continue
+                yield tag_data.get("version", "_NO_VERSION"), tag_data, None
+                continue
+
+            stub_version = template.replace("{tag}", ver_tag)
+            stub = dict(data, version=stub_version, __ver_tag__=ver_tag)
+            load = partial(self._evaluate_tag, filepath, ver_tag,
+                           stub_version)
+            yield stub_version, stub, load
+
+    def _evaluate_tag(self, filepath, ver_tag, expected_version):
+        data = self._evaluate_or_report(filepath, ver_tag=ver_tag)
+        if data is None:
+            return None
+        version = str(data.get("version", "_NO_VERSION"))
+        if version != expected_version:
+            # listed under the wrong version, drop it
+            self._report_failure(
+                filepath, ver_tag,
+                "Version of tag evaluated as %s, but expected %s"
+                % (version, expected_version))
+            return None
+        return data
+
+    def _get_family_index(self):
+        """Return family name to path index, rebuild if root has changed
+
+        The index is refreshed when the mtime of repository root changes,
+        which is when a family dir gets added, removed or renamed. Loaded
+        families that no longer exist are dropped, and the missing family
+        names are forgotten.
+
+        Returns:
+            dict: Family name (package dir name) as key and path as value
+
+        """
+        stamp = self._stamp()
+        if stamp is not None and stamp == self._index_stamp:
+            return self._family_index
+
+        if self._index_stamp is not None:
+            # let filesystem repository see the change as well
+            fs_repo = package_repository_manager.get_repository(self._root)
+            fs_repo.clear_caches()
+
+        self._family_index = {
+            family.name: os.path.join(self._root, family.name)
+            for family in iter_package_families(paths=[self._root])
+        } if stamp is not None else dict()
+        self._index_stamp = stamp
+        self._missing.clear()
+        subprocess_memo.clear()
+
+        for name in list(self._loaded_cache):
+            if name not in self._family_index:
+                self._loaded_cache.pop(name)
+
+        return self._family_index
 
     def _generate_dev_packages(self, family):
         for package in family.iter_packages():  # package order is random
             if not package.uri:  # A sub-dir in Family dir without package file
                 continue
 
-            filepath = package.uri
-            dirpath = os.path.dirname(filepath)
-            with os_chdir(dirpath):
-                # If we don't change cwd to package dir, dev package data may
-                # not be retrieved/evaluated correctly.
-                # For example, `git shortlog` is often being used to get
-                # package authors, which will not work and hang the process
-                # with message "reading log message from standard input", if
-                # cwd is not (in) a git repository.
-
-                git_url = package.data.get("git_url")
-
-                if git_url:
-                    # generate versions from git tags
-                    for ver_str in self._sorted_versions_from_remote(git_url):
-                        with temp_env("REZ_DELIVER_PKG_PAYLOAD_VER", ver_str):
-                            developer = DeveloperPackage.from_path(dirpath)
-
-                            data = developer.data.copy()
-                            data["__ver_tag__"] = ver_str
-                            data["__source__"] = developer.filepath
-                            version = data.get("version", "_NO_VERSION")
-
-                            yield version, data
+            for version, data in self._generate_from_file(package.uri):
+                yield version, data
 
-                else:
-                    developer = DeveloperPackage.from_path(dirpath)
+    def _generate_from_file(self, filepath):
+        data = self._evaluate_or_report(filepath)
+        if data is None:
+            return
+        git_url = data.get("git_url")
+
+        if git_url:
+            # generate versions from git tags
+            policy = data.get("git_tag_policy")
+            for ver_str in self._sorted_versions_from_remote(git_url, policy):
+                data = self._evaluate_or_report(filepath, ver_tag=ver_str)
+                if data is None:
+                    continue
+                version = data.get("version", "_NO_VERSION")
 
-                    data = developer.data.copy()
-                    data["__source__"] = developer.filepath
-                    version = data.get("version", "_NO_VERSION")
+                yield version, data
 
-                    yield version, data
+        else:
+            version = data.get("version", "_NO_VERSION")
+
+            yield version, data
+
+    def _evaluate(self, filepath, ver_tag=None):
+        """Evaluate developer package, or get the data from persistent cache
+
+        Args:
+            filepath (str): The package.py file path
+            ver_tag (str): Payload version tag from git remote, optional.
+
+        Returns:
+            dict: A copy of evaluated package data
+
+        Raises:
+            RezDeliverEvaluationError: If `evaluation_timeout` is set in
+                config and the evaluation did not finish in time.
+
+        """
+        release = self._loader.release
+        data = self._data_cache.get(filepath, ver_tag=ver_tag, release=release)
+        if data is not None:
+            return data
 
-    def _sorted_versions_from_remote(self, git_url):
         deliverconfig = rezconfig.plugins.command.deliver
-        limit = deliverconfig.max_git_tag_from_remote
-        versions = list()
-
-        for ver_tag in self._git_tags(git_url):
-            try:
-                version = Version(ver_tag)
-            except VersionError as e:
-                print("Error parsing tag [%s]: %s" % (ver_tag, str(e)))
-            else:
-                versions.append(version)
+        timeout = deliverconfig.evaluation_timeout
+        if timeout and _watchdog.enabled:
+            overrides = rezconfig.overrides.copy()
+            data = _watchdog.run(
+                _evaluate_in_worker,
+                (self._root, filepath, ver_tag, release, overrides),
+                timeout=timeout,
+            )
+        else:
+            data = self._evaluate_file(filepath, ver_tag)
 
-        return [
-            str(version) for version in sorted(versions)[-limit:]
-        ]
+        self._data_cache.put(filepath, data, ver_tag=ver_tag, release=release)
+
+        return data
+
+    def _evaluate_or_report(self, filepath, ver_tag=None):
+        """Evaluate developer package, return None if it failed
+
+        Package that has failed is not evaluated again until its package.py
+        gets changed.
+
+        """
+        key = (filepath, ver_tag)
+        stamp = self._data_cache._stamp(filepath)
+        if key in self._failures:
+            if self._failures[key][0] == stamp:
+                return None
+            del self._failures[key]
+
+        try:
+            return self._evaluate(filepath, ver_tag=ver_tag)
+        except RezDeliverEvaluationError as e:
+            self._report_failure(filepath, ver_tag, str(e), stamp=stamp)
+            return None
+
+    def _report_failure(self, filepath, ver_tag, reason, stamp=None):
+        message = "%s [%s%s]" % (reason, filepath,
+                                 (" @ " + ver_tag) if ver_tag else "")
+        print(message)
+        stamp = stamp or self._data_cache._stamp(filepath)
+        self._failures[(filepath, ver_tag)] = (stamp, message)
+
+    def _evaluate_file(self, filepath, ver_tag=None):
+        dirpath = os.path.dirname(filepath)
+        env = {"REZ_DELIVER_PKG_PAYLOAD_VER": ver_tag}
+        with evaluation_scope(cwd=dirpath, env=env), use_code_cache(), \
+                use_subprocess_memo():
+            # If we don't change cwd to package dir, dev package data may
+            # not be retrieved/evaluated correctly.
+            # For example, `git shortlog` is often being used to get
+            # package authors, which will not work and hang the process
+            # with message "reading log message from standard input", if
+            # cwd is not (in) a git repository.
+            developer = DeveloperPackage.from_path(dirpath)
+
+        data = developer.data.copy()
+        data["__source__"] = developer.filepath
+        if ver_tag:
+            data["__ver_tag__"] = ver_tag
+
+        return data
+
+    def _sorted_versions_from_remote(self, git_url, policy=None):
+        """Return version tags of git remote selected by tag policy
+
+        Args:
+            git_url (str): Git remote url
+            policy (dict): Package's `git_tag_policy` that overrides the
+                one in deliver config, optional.
+
+        Returns:
+            list: Version strings, sorted from oldest.
+
+        """
+        deliverconfig = rezconfig.plugins.command.deliver
+        policy = dict(deliverconfig.git_tag_policy or {}, **(policy or {}))
+
+        limit = policy.get("limit", deliverconfig.max_git_tag_from_remote)
+        try:
+            return select_tags(self._git_tags(git_url),
+                               include=policy.get("include"),
+                               exclude=policy.get("exclude"),
+                               range_=policy.get("range"),
+                               limit=limit,
+                               source=git_url)
+        except (re.error, VersionError) as e:
+            print("Invalid git tag policy %r: %s" % (policy, str(e)))
+            return []
 
     def _git_tags(self, url):
-        args = ["git", "ls-remote", "--tags", url]
+        if url not in self._remote_tags:
+            self._resolve_git_tags([url])
+        return self._remote_tags.get(url) or []
+
+
+class _LazyVersions(Mapping):
+    """Versions of one package family, each evaluated on first access
+
+    Works like a dict for memory repository, membership test and listing
+    versions do not trigger evaluation. A version is dropped if its loader
+    returns None, e.g. evaluation failed.
+
+    """
+
+    def __init__(self, on_dropped=None):
+        self._loaders = dict()
+        self._loaded = dict()
+        self._on_dropped = on_dropped
+
+    def add(self, version, load=None, data=None):
+        self._loaders[version] = load
+        if data is not None:
+            self._loaded[version] = interner.intern_data(data)
+
+    def is_loaded(self, version):
+        return version in self._loaded
+
+    def __getitem__(self, version):
+        if version not in self._loaded:
+            load = self._loaders[version]
+            with override_config({"allow_unversioned_packages": True}):
+                if version not in self._loaded:
+                    data = load()
+                    if data is None:
+                        self._drop(version)
+                        raise KeyError(version)
+                    self._loaded[version] = interner.intern_data(data)
+        return self._loaded[version]
+
+    def _drop(self, version):
+        self._loaders.pop(version, None)
+        if self._on_dropped is not None:
+            self._on_dropped([version])
+
+    def __contains__(self, version):
+        return version in self._loaders
+
+    def __iter__(self):
+        return iter(self._loaders)
+
+    def __len__(self):
+        return len(self._loaders)
+
+
+def _may_have_git_url(filepath):
+    try:
+        with open(filepath, "rb") as f:
+            return b"git_url" in f.read()
+    except (IOError, OSError):
+        return True
+
+
+def _load_family_in_worker(root, name, release, remote_tags=None,
+                           overrides=None):
+    """Evaluate one developer package family in worker process
+
+    The worker is spawned and gets rezconfig from environment like any
+    other rez process, plus the `overrides` made in parent process. The
+    loader is re-created from that config. Git tags listed by parent
+    process are passed in as `remote_tags`.
+
+    Returns:
+        tuple: Evaluated package data of each version (or None if family
+            not found), and the evaluation failures recorded in worker.
+
+    """
+    with override_config(overrides or {}):
+        loader = PackageLoader()
+        loader.release = release
+        repo = loader._get_repo(root) or DevPkgRepo(root=root, loader=loader)
+        repo._remote_tags.update(remote_tags or {})
+
+        with override_config(loader.settings):
+            family = get_package_family_from_repository(name, root)
+            if family is None:
+                return None, dict()
+
+            versions = {
+                version: data for version, data
+                in repo._generate_dev_packages(family)
+            }
+            return versions, repo._failures
+
+
+def _evaluate_in_worker(root, filepath, ver_tag, release, overrides):
+    """Evaluate one developer package in watchdog worker process
+
+    Returns:
+        dict: Evaluated package data
+
+    """
+    _watchdog.enabled = False  # we are the watchdog's worker
+
+    with override_config(overrides):
+        loader = PackageLoader()
+        loader.release = release
+        repo = loader._get_repo(root) or DevPkgRepo(root=root, loader=loader)
+
+        return repo._evaluate_file(filepath, ver_tag=ver_tag)
+
+
+class _Watchdog(object):
+    """Run function in a single worker process with timeout
+
+    The worker is killed and replaced on timeout, so a hanging function
+    won't be able to block the caller. Worker is spawned instead of forked
+    since the caller may be holding `evaluation_lock`.
+
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._pool = None
+        self._pid = None
+        atexit.register(self.close)
+
+    def run(self, func, args, timeout):
+        """Call `func(*args)` in worker and return the result
+
+        Raises:
+            RezDeliverEvaluationError: If not returned in `timeout` seconds.
+
+        """
+        if self._pool is None or self._pid != os.getpid():
+            # pool inherited from forked parent is not ours to use
+            context = multiprocessing.get_context("spawn")
+            self._pool = context.Pool(processes=1)
+            self._pid = os.getpid()
+
+        result = self._pool.apply_async(func, args)
         try:
-            output = subprocess.check_output(args, universal_newlines=True)
-        except subprocess.CalledProcessError as e:
-            print(e)
-        else:
-            for line in output.splitlines():
-                yield line.split("refs/tags/")[-1]
+            return result.get(timeout)
+        except multiprocessing.TimeoutError:
+            self.close()
+            raise RezDeliverEvaluationError(
+                "Evaluation timed out after %s seconds" % timeout)
+
+    def close(self):
+        """Terminate the worker, a new one is spawned on next run"""
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.terminate()
+            self._pool.join()
+        self._pool = None
+
+
+_watchdog = _Watchdog()
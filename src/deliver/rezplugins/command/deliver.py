@@ -48,6 +48,9 @@ def setup_parser(parser, completions=False):
                         help="Yes to all.")
     parser.add_argument("-G", "--gui", action="store_true",
                         help="Launch GUI.")
+    parser.add_argument("--refresh-tags", action="store_true",
+                        help="Re-list git tags of developer packages from "
+                             "remote instead of using cached ones.")
     parser.add_argument("--version", action="store_true",
                         help="Print out version of this plugin command.")
 
@@ -60,6 +63,10 @@ def command(opts, parser=None, extra_arg_groups=None):
         from deliver._version import print_info
         sys.exit(print_info())
 
+    if opts.refresh_tags:
+        from deliver.api import PackageLoader
+        PackageLoader().refresh_git_tags()
+
     if opts.gui:
         from deliver.gui import app
         return app.main()
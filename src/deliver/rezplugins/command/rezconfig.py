@@ -14,4 +14,106 @@ deliver = {
 
     "max_git_tag_from_remote": 10,
 
+    # Which git tags are turned into package versions, with optional keys:
+    #   "include": regex that tag must match
+    #   "exclude": regex that tag must not match
+    #   "range": version range that tag must be in, e.g. "1.2+<2"
+    #   "limit": max number of latest tags, `max_git_tag_from_remote` if
+    #       not given
+    # Can be overridden per package by `git_tag_policy` in package.py.
+    "git_tag_policy": {},
+
+    # Max number of concurrent `git ls-remote` calls when listing tags of
+    # developer packages' `git_url` on full scan, and seconds to wait for
+    # each call.
+    "git_remote_workers": 8,
+    "git_remote_timeout": 60,
+
+    # Seconds before cached git tags (under `cache_root`) are considered
+    # stale. Stale tags are still used, and re-listed in background for the
+    # next session. Never stale if set to None.
+    "git_tag_cache_ttl": 3600,
+
+    # Keep a local bare mirror of each `git_url` under `cache_root`, update
+    # it with incremental fetch and read tags from it, instead of listing
+    # all remote refs by `git ls-remote` every time.
+    "git_tag_mirrors": False,
+
+    # On building package with `git_url`, keep a local bare mirror of it and
+    # a worktree of the tag under `cache_root`, and expose them to build
+    # script via env var `REZ_DELIVER_PKG_PAYLOAD_MIRROR` and
+    # `REZ_DELIVER_PKG_PAYLOAD_WORKTREE`.
+    "git_payload_cache": False,
+
+    # Seconds to wait for payload archive download, see `deliver.payload`.
+    "download_timeout": 300,
+
+    # Root dir of deliver's persistent caches, e.g. evaluated developer
+    # package data and compiled package.py code. Disabled if not set.
+    "cache_root": None,
+
+    # Number of worker processes for evaluating developer package families
+    # in parallel on full scan. Evaluate serially in current process if less
+    # than 2.
+    "evaluation_processes": 0,
+
+    # Evaluate each developer package (or git tag of it) in an isolated
+    # worker process, and give up if it takes longer than this many seconds.
+    # The package is reported as failed and skipped, so one hanging
+    # package.py cannot stall a full scan. Disabled if not set.
+    "evaluation_timeout": None,
+
+    # Watch developer repositories in GUI, and re-evaluate changed package
+    # families every `watch_interval` seconds.
+    "watch_dev_repositories": False,
+    "watch_interval": 2,
+
+    # Only evaluate developer package versions that are actually being
+    # queried, versions are told by version dir names. For package that has
+    # `git_url`, only the latest tag is evaluated upfront, versions of other
+    # tags are derived from it.
+    "lazy_evaluation": False,
+
+    # Memoize identical `subprocess.check_output` and `subprocess.run` (with
+    # output captured) calls made in package.py evaluation, e.g. `git
+    # shortlog` for authors, until the developer repository changes.
+    # Calls are told apart by arguments, working dir, `env` argument and
+    # values of the environment variables listed in `memoize_subprocess_env`,
+    # e.g. add "REZ_DELIVER_PKG_PAYLOAD_VER" if a command's output depends on
+    # the git tag being evaluated.
+    "memoize_subprocess": False,
+    "memoize_subprocess_env": [],
+
+    # Max number of evaluated package families to keep in memory, least
+    # recently used ones get evicted and re-evaluated on next query. No
+    # limit if set to 0.
+    "max_loaded_families": 0,
+
+    # Build-time contexts resolved by `RequestSolver` are memoized by their
+    # requests, conflicts, package paths and repository state, so each
+    # distinct solve only happens once in a `resolve` call. Keep them across
+    # `resolve` calls as well if this is True.
+    "keep_build_contexts": False,
+
+    # Latest rez version for rez package maker is looked up from this local
+    # index if set, which can be a dir of rez distribution files (e.g. a
+    # wheelhouse) or a saved PyPI simple index page. Otherwise it is looked
+    # up from PyPI, unless `pypi_offline` is True. The result is cached
+    # under `cache_root` for `rez_version_ttl` seconds.
+    "rez_version_index": None,
+    "rez_version_ttl": 86400,
+    "pypi_offline": False,
+    "pypi_timeout": 10,
+
+    # Local dir of rez wheels or sdists for rez package maker to pip install
+    # from, in addition to PyPI (or instead of, if `pypi_offline`). The pip
+    # installed rez is cached under `cache_root` per rez and python version,
+    # and hardlinked (or copied) on each local install. Released packages
+    # always get a real copy, so they never share files with the cache.
+    "rez_wheelhouse": None,
+
+    # Max number of variants of package maker (e.g. rez for each python
+    # version) being installed concurrently.
+    "maker_variant_processes": 4,
+
 }
@@ -21,11 +21,13 @@ from rez.exceptions import PackageFamilyNotFoundError, PackageNotFoundError
 
 from deliver.repository import PackageLoader
 from deliver.exceptions import RezDeliverRequestError, RezDeliverFatalError
-from deliver.lib import os_chdir, override_config, expand_path, temp_env
+from deliver.lib import evaluation_scope, expand_path, repo_cache_serial
+from deliver.cache import use_code_cache, use_subprocess_memo
 
 
 class Required(object):
-    __slots__ = ("name", "index", "source", "status", "depended", "ver_tag")
+    __slots__ = ("name", "index", "source", "status", "depended", "ver_tag",
+                 "git_url")
 
     def __init__(self, name, index):
         self.name = name
@@ -34,17 +36,30 @@ class Required(object):
         self.status = None
         self.depended = []
         self.ver_tag = None  # from remote git repo, for PackageInstaller
+        self.git_url = None
 
     @classmethod
     def get(cls, name, index=-1, from_=None):
+        """Return existing `Required` from a manifest, or a new one
+
+        Args:
+            name (str): Package qualified name
+            index (int): Variant index
+            from_ (dict): Manifest that maps (name, index) to `Required`
+
+        Returns:
+            `Required`
+
+        """
         name = str(name)
-        from_ = from_ or []
-        try:
-            req_id = from_.index((name, index))
-        except ValueError:
+        requested = (from_ or {}).get((name, index))
+        if requested is None:
             return cls(name, index)
-        else:
-            return from_[req_id]
+        return requested
+
+    @property
+    def key(self):
+        return self.name, self.index
 
     def __eq__(self, other):
         return other == (self.name, self.index)
@@ -96,8 +111,10 @@ class RequestSolver(object):
         self.loader = loader or PackageLoader()
         self._release = False
         self._deploy_path = None
-        self._requirements = list()
+        self._requirements = dict()  # (name, index) -> Required
         self._conflicts = list()
+        self._contexts = dict()  # memoized build-time contexts
+        self._contexts_state = None
         self.__depended = None
 
     @property
@@ -115,8 +132,10 @@ class RequestSolver(object):
 
     def reset(self):
         """Reset resolved manifest"""
-        self._requirements = []
+        self._requirements = dict()
         self.__depended = None
+        if not rezconfig.plugins.command.deliver.keep_build_contexts:
+            self._contexts.clear()
 
     def deploy_to(self, path):
         """Set package deploy path
@@ -249,7 +268,7 @@ class RequestSolver(object):
             list: A list of `Required` object
 
         """
-        return self._requirements[:]
+        return list(self._requirements.values())
 
     def _find_installed(self, request):
         paths = self.installed_packages_path
@@ -357,6 +376,7 @@ class RequestSolver(object):
             requested.source = source
             requested.status = status
             requested.ver_tag = variant.parent.data.get("__ver_tag__")
+            requested.git_url = variant.parent.data.get("git_url")
 
             if status == self.Ready and i_van is not None:
                 requested.status = self.Installed
@@ -425,12 +445,38 @@ class RequestSolver(object):
         paths = self.loader.paths + self.installed_packages_path
         requests = variant_requires + self._conflicts
 
-        return ResolvedContext(
-            requests,
-            building=True,
-            package_paths=paths,
-            package_load_callback=self._re_evaluate_variant_callback
+        # contexts are stale once packages or config have changed
+        state = (
+            self.loader.state(),
+            repo_cache_serial(),
+            repr(rezconfig.overrides),
         )
+        if state != self._contexts_state:
+            self._contexts.clear()
+            self._contexts_state = state
+
+        # variants that have identical requires (e.g. python-3.9 variant of
+        #   each family) share the same context
+        key = (
+            tuple(str(r) for r in variant_requires),
+            tuple(str(r) for r in self._conflicts),
+            tuple(paths),
+        )
+        context = self._contexts.get(key)
+        if context is not None:
+            return context
+
+        # rez config is read throughout the solve
+        with evaluation_scope():
+            context = ResolvedContext(
+                requests,
+                building=True,
+                package_paths=paths,
+                package_load_callback=self._re_evaluate_variant_callback
+            )
+
+        self._contexts[key] = context
+        return context
 
     def _re_evaluate_variant_callback(self, package):
         """Package load callback in context resolving time
@@ -460,16 +506,20 @@ class RequestSolver(object):
         package.filepath = filepath
 
         pkg_path = os.path.dirname(filepath)
-        with override_config(self.loader.settings), os_chdir(pkg_path):
+        ver_tag = package.data.get("__ver_tag__")
+        env = {"REZ_DELIVER_PKG_PAYLOAD_VER": ver_tag}
 
-            ver_tag = package.data.get("__ver_tag__")
-            with temp_env("REZ_DELIVER_PKG_PAYLOAD_VER", ver_tag):
+        with evaluation_scope(cwd=pkg_path,
+                              env=env,
+                              config=self.loader.settings), \
+                use_code_cache(), \
+                use_subprocess_memo():
 
-                re_evaluated_package = package.get_reevaluated({
-                    "building": True,
-                    "build_variant_index": variant.index or 0,
-                    "build_variant_requires": variant.variant_requires
-                })
+            re_evaluated_package = package.get_reevaluated({
+                "building": True,
+                "build_variant_index": variant.index or 0,
+                "build_variant_requires": variant.variant_requires
+            })
 
         re_evaluated_package.set_context(context)
         re_evaluated_variant = re_evaluated_package.get_variant(variant.index)
@@ -477,8 +527,8 @@ class RequestSolver(object):
         return re_evaluated_variant
 
     def _append(self, requested):
-        if requested not in self._requirements:
-            self._requirements.append(requested)
+        if requested.key not in self._requirements:
+            self._requirements[requested.key] = requested
 
 
 def parse_package_family_not_found_error(message):
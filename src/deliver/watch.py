@@ -0,0 +1,239 @@
+
+import os
+import sys
+import errno
+import struct
+import ctypes
+import ctypes.util
+
+from rez.config import config as rezconfig
+
+
+def _is_package_file(filename):
+    names = rezconfig.plugins.package_repository.filesystem.package_filenames
+    name, ext = os.path.splitext(filename)
+    return name in names and ext in (".py", ".yaml", ".txt")
+
+
+def _list_dirs(path):
+    try:
+        return [
+            entry.name for entry in os.scandir(path)
+            if entry.is_dir() and not entry.name.startswith(".")
+        ]
+    except OSError:
+        return []
+
+
+def create_watcher(root):
+    """Return an inotify watcher for `root` if possible, or a polling one
+
+    Args:
+        root (str): Developer package repository root
+
+    Returns:
+        `InotifyWatcher` or `PollingWatcher`
+
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            print("inotify unavailable, fallback to polling: %s" % str(e))
+    return PollingWatcher(root)
+
+
+class PollingWatcher(object):
+    """Detect changed package families by comparing file stats
+
+    Only family dirs, version dirs and package definition files are being
+    looked at, so this is about the same cost as listing the repository.
+
+    """
+
+    def __init__(self, root):
+        self._root = root
+        self._snapshot = self._take_snapshot()
+
+    def poll(self):
+        """Return names of families that have been changed since last poll
+
+        Returns:
+            set: Changed, added or removed family names
+
+        """
+        snapshot = self._take_snapshot()
+        previous = self._snapshot
+        self._snapshot = snapshot
+
+        return {
+            name for name in set(snapshot).union(previous)
+            if snapshot.get(name) != previous.get(name)
+        }
+
+    def close(self):
+        self._snapshot = dict()
+
+    def _take_snapshot(self):
+        snapshot = dict()
+        for name in _list_dirs(self._root):
+            family_path = os.path.join(self._root, name)
+            snapshot[name] = tuple(self._iter_stamps(family_path))
+        return snapshot
+
+    def _iter_stamps(self, family_path):
+        dirs = [family_path] + [
+            os.path.join(family_path, d) for d in _list_dirs(family_path)
+        ]
+        for dirpath in dirs:
+            try:
+                entries = list(os.scandir(dirpath))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir() or _is_package_file(entry.name):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    yield entry.path, st.st_mtime_ns, st.st_size
+
+
+class InotifyWatcher(object):
+    """Detect changed package families by Linux inotify events
+
+    Root dir, family dirs and version dirs are watched. Events are read
+    without blocking on each `poll`.
+
+    """
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+
+    Mask = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+            IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+
+    _event = struct.Struct("iIII")
+
+    def __init__(self, root):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",
+                           use_errno=True)
+        fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        self._libc = libc
+        self._fd = fd
+        self._root = root
+        self._watches = dict()  # watch descriptor -> (family name, depth)
+        self._add_tree()
+
+    def poll(self):
+        """Return names of families that have been changed since last poll
+
+        Returns:
+            set: Changed, added or removed family names
+
+        """
+        changed = set()
+        if self._fd is None:
+            return changed
+
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            if not buf:
+                break
+            self._parse(buf, changed)
+
+        return changed
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._watches.clear()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def _parse(self, buf, changed):
+        offset = 0
+        while offset < len(buf):
+            wd, mask, _, length = self._event.unpack_from(buf, offset)
+            offset += self._event.size
+            name = buf[offset:offset + length].rstrip(b"\0")
+            name = os.fsdecode(name)
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                # events lost, consider everything changed
+                changed.update(_list_dirs(self._root))
+                self._rewatch()
+                continue
+
+            if wd not in self._watches:
+                continue
+
+            family, depth = self._watches[wd]
+            if mask & self.IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            is_dir = bool(mask & self.IN_ISDIR)
+            if family is None:
+                # repository root
+                if is_dir and name:
+                    changed.add(name)
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        path = os.path.join(self._root, name)
+                        self._add_family(name, path)
+                continue
+
+            if is_dir or _is_package_file(name) or not name:
+                changed.add(family)
+                if is_dir and depth == 1 \
+                        and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    path = os.path.join(self._root, family, name)
+                    self._add_watch(path, family, 2)
+
+    def _add_watch(self, path, family, depth):
+        wd = self._libc.inotify_add_watch(self._fd,
+                                          os.fsencode(path),
+                                          self.Mask)
+        if wd >= 0:
+            self._watches[wd] = (family, depth)
+
+    def _add_family(self, name, path):
+        self._add_watch(path, name, 1)
+        for version in _list_dirs(path):
+            self._add_watch(os.path.join(path, version), name, 2)
+
+    def _add_tree(self):
+        self._add_watch(self._root, None, 0)
+        for name in _list_dirs(self._root):
+            self._add_family(name, os.path.join(self._root, name))
+
+    def _rewatch(self):
+        for wd in list(self._watches):
+            self._libc.inotify_rm_watch(self._fd, wd)
+        self._watches.clear()
+        self._add_tree()
@@ -0,0 +1,805 @@
+
+import os
+import sys
+import copy
+import time
+import shutil
+import tempfile
+import unittest
+import subprocess
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from rez.utils.formatting import PackageRequest
+from rez.developer_package import DeveloperPackage
+from deliver.api import PackageLoader
+from deliver.repository import DevPkgRepo, _LazyVersions
+from deliver.cache import code_cache, subprocess_memo
+from deliver.git import ls_remote_tags, read_local_tags, select_tags
+from deliver.watch import PollingWatcher, InotifyWatcher
+from deliver.lib import override_config
+from tests.util import TestBase
+from tests.ghostwriter import DeveloperRepository, early
+
+
+class TestLoader(TestBase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp(prefix="rez_deliver_test_")
+        install_path = os.path.join(root, "install")
+        release_path = os.path.join(root, "release")
+        dev_repo_path = os.path.join(root, "developer")
+        cache_root = os.path.join(root, "cache")
+
+        self.root = root
+        self.dev_repo_path = dev_repo_path
+        self.dev_repo = DeveloperRepository(dev_repo_path)
+        self.settings = {
+            "packages_path": [install_path, release_path],
+            "local_packages_path": install_path,
+            "release_packages_path": release_path,
+            "plugins": {
+                "command": {"deliver": {
+                    "dev_repository_roots": [dev_repo_path],
+                    "cache_root": cache_root,
+                }}
+            }
+        }
+        super(TestLoader, self).setUp()
+
+        PackageLoader.clear_instance()
+
+    def tearDown(self):
+        super(TestLoader, self).tearDown()
+        retries = 5
+        if os.path.exists(self.root):
+            for i in range(retries):
+                try:
+                    shutil.rmtree(self.root)
+                    break
+                except Exception:
+                    if i < (retries - 1):
+                        time.sleep(0.2)
+
+    def _deliver_config(self, **entries):
+        deliver = self.settings["plugins"]["command"]["deliver"].copy()
+        deliver.update(entries)
+        return override_config({"plugins": {"command": {"deliver": deliver}}})
+
+    def _new_loader(self):
+        PackageLoader.clear_instance()
+        return PackageLoader()
+
+    def _git_remote(self, name, tags):
+        path = os.path.join(self.root, "remotes", name)
+        git = ["git", "-C", path,
+               "-c", "user.name=deliver", "-c", "user.email=deliver@test"]
+        os.makedirs(path)
+        subprocess.check_call(git + ["init", "-q"])
+        for tag in tags:
+            subprocess.check_call(git + ["commit", "-q", "--allow-empty",
+                                         "-m", tag])
+            subprocess.check_call(git + ["tag", tag])
+        return path
+
+    def test_persistent_package_cache(self):
+        self.dev_repo.add("foo", version="1", tools=["foo"])
+
+        loader = self._new_loader()
+        package = loader.find(PackageRequest("foo"))
+        self.assertEqual(["foo"], package.tools)
+
+        # warm run, should not evaluate package.py at all
+        loader = self._new_loader()
+        with patch.object(DeveloperPackage, "from_path",
+                          side_effect=AssertionError("evaluated")):
+            package = loader.find(PackageRequest("foo"))
+        self.assertEqual(["foo"], package.tools)
+
+    def test_persistent_package_cache_outdated(self):
+        self.dev_repo.add("foo", version="1", tools=["foo"])
+
+        loader = self._new_loader()
+        loader.find(PackageRequest("foo"))
+
+        self.dev_repo.add("foo", version="1", tools=["foo", "bar"])
+        filepath = os.path.join(self.dev_repo_path, "foo", "1", "package.py")
+        mtime = os.stat(filepath).st_mtime + 10
+        os.utime(filepath, (mtime, mtime))
+
+        loader = self._new_loader()
+        package = loader.find(PackageRequest("foo"))
+        self.assertEqual(["foo", "bar"], package.tools)
+
+    def test_parallel_evaluation(self):
+        self.dev_repo.add("foo", version="1", tools=["foo"])
+        self.dev_repo.add("foo", version="2", tools=["foo"])
+        self.dev_repo.add("bar", version="1", requires=["foo"])
+        self.dev_repo.add("egg")
+
+        with self._deliver_config(evaluation_processes=2):
+            loader = self._new_loader()
+            loader.preload()
+
+        repo = loader._get_repo(self.dev_repo_path)
+        self.assertEqual(["bar", "egg", "foo"], sorted(repo._loaded_cache))
+        self.assertEqual(["1", "2"], sorted(repo._loaded_cache["foo"]))
+
+        versions = {
+            name: sorted(versions)
+            for name, versions in repo.iter_dev_packages()
+        }
+        self.assertEqual({"foo": ["1", "2"],
+                          "bar": ["1"],
+                          "egg": ["_NO_VERSION"]}, versions)
+
+    def test_parallel_evaluation_spawn(self):
+        from deliver import repository
+
+        self.dev_repo.add("foo", version="1", tools=["foo"])
+        self.dev_repo.add("bar", version="1", requires=["foo"])
+
+        with self._deliver_config(evaluation_processes=2), \
+                patch.object(repository, "ProcessPoolExecutor",
+                             wraps=repository.ProcessPoolExecutor) as pool:
+            loader = self._new_loader()
+            loader.preload()
+
+        # not forked while tag revalidating threads may be running
+        context = pool.call_args.kwargs["mp_context"]
+        self.assertEqual("spawn", context.get_start_method())
+        # spawned workers got the dev repository root from overrides
+        repo = loader._get_repo(self.dev_repo_path)
+        self.assertEqual(["bar", "foo"], sorted(repo._loaded_cache))
+
+    def test_parallel_evaluation_failed(self):
+        from deliver import repository
+
+        @early()
+        def tools():
+            raise Exception("bad package")
+
+        self.dev_repo.add("foo", version="1", tools=tools)
+        self.dev_repo.add("bar", version="1", tools=tools)
+
+        with self._deliver_config(evaluation_processes=2):
+            loader = self._new_loader()
+            loader.preload()
+
+            # not retried in worker on next preload
+            with patch.object(repository, "ProcessPoolExecutor",
+                              side_effect=AssertionError("retried")):
+                loader.preload()
+
+            # but retried once invalidated
+            loader._get_repo(self.dev_repo_path).invalidate()
+            with patch.object(repository, "ProcessPoolExecutor",
+                              side_effect=AssertionError("retried")):
+                self.assertRaises(AssertionError, loader.preload)
+
+    def test_family_index(self):
+        self.dev_repo.add("foo", version="1")
+
+        loader = self._new_loader()
+        repo = loader._get_repo(self.dev_repo_path)
+        self.assertTrue(repo.has_package("foo"))
+        self.assertFalse(repo.has_package("bar"))
+
+        self.dev_repo.add("bar", version="1")
+        mtime = os.stat(self.dev_repo_path).st_mtime + 10
+        os.utime(self.dev_repo_path, (mtime, mtime))
+
+        self.assertTrue(repo.has_package("bar"))
+        self.assertEqual("bar-1",
+                         loader.find(PackageRequest("bar")).qualified_name)
+
+    def test_missing_family_cache(self):
+        self.dev_repo.add("foo", version="1")
+
+        loader = self._new_loader()
+        repo = loader._get_repo(self.dev_repo_path)
+        self.assertIsNone(repo.get("python"))
+        self.assertIsNone(loader.find(PackageRequest("python")))
+
+        # no more lookup after first miss
+        with patch.object(DevPkgRepo, "_get_family_index",
+                          side_effect=AssertionError("looked up")):
+            self.assertFalse("python" in repo)
+            self.assertIsNone(repo.get("python"))
+            self.assertEqual({}, repo["python"])
+
+        # invalidated once the repository changed
+        self.dev_repo.add("python", version="3.7")
+        mtime = os.stat(self.dev_repo_path).st_mtime + 10
+        os.utime(self.dev_repo_path, (mtime, mtime))
+
+        self.assertTrue("python" in repo)
+        self.assertEqual("python-3.7",
+                         loader.find(PackageRequest("python")).qualified_name)
+
+    def _test_watch(self, watcher_cls):
+        self.dev_repo.add("foo", version="1", tools=["foo"])
+        self.dev_repo.add("bar", version="1")
+
+        loader = self._new_loader()
+        repo = loader._get_repo(self.dev_repo_path)
+        loader.find(PackageRequest("foo"))
+        loader.find(PackageRequest("bar"))
+
+        with patch("deliver.repository.create_watcher", watcher_cls):
+            loader.watch()
+        self.assertEqual([], loader.poll_changes())
+
+        self.dev_repo.add("foo", version="1", tools=["foo", "egg"])
+        self.dev_repo.add("foo", version="2")
+        filepath = os.path.join(self.dev_repo_path, "foo", "1", "package.py")
+        mtime = os.stat(filepath).st_mtime + 10
+        os.utime(filepath, (mtime, mtime))
+
+        self.assertEqual(["foo"], loader.poll_changes())
+        self.assertIn("bar", repo._loaded_cache)
+        self.assertEqual(["1", "2"], sorted(repo._loaded_cache["foo"]))
+
+        package = loader.find(PackageRequest("foo-1"))
+        self.assertEqual(["foo", "egg"], package.tools)
+        loader.unwatch()
+
+    def test_watch_polling(self):
+        self._test_watch(PollingWatcher)
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify only")
+    def test_watch_inotify(self):
+        self._test_watch(InotifyWatcher)
+
+    def test_lazy_evaluation(self):
+        self.dev_repo.add("foo", version="1")
+        self.dev_repo.add("foo", version="2")
+        self.dev_repo.add("foo", version="3")
+
+        with self._deliver_config(lazy_evaluation=True):
+            loader = self._new_loader()
+            package = loader.find(PackageRequest("foo-2"))
+            self.assertEqual("2", package.data["version"])
+
+        versions = loader._get_repo(self.dev_repo_path)._loaded_cache["foo"]
+        self.assertEqual(["1", "2", "3"], sorted(versions))
+        self.assertFalse(versions.is_loaded("1"))
+        self.assertTrue(versions.is_loaded("2"))
+        self.assertFalse(versions.is_loaded("3"))
+
+    def test_static_package_summaries(self):
+        @early()
+        def tools():
+            return ["bar"]
+
+        self.dev_repo.add("foo", version="1", tools=["foo"],
+                          variants=[["a"], ["b"]], description="static")
+        self.dev_repo.add("bar", version="1", tools=tools)
+
+        loader = self._new_loader()
+        repo = loader._get_repo(self.dev_repo_path)
+
+        with patch.object(DeveloperPackage, "from_path",
+                          wraps=DeveloperPackage.from_path) as evaluate:
+            summaries = {
+                s["qualified_name"]: s for s in repo.iter_package_summaries()
+            }
+        # only the dynamic one gets evaluated
+        self.assertEqual(1, evaluate.call_count)
+
+        self.assertEqual(["foo"], summaries["foo-1"]["tools"])
+        self.assertEqual(2, summaries["foo-1"]["num_variants"])
+        self.assertEqual("static", summaries["foo-1"]["description"])
+        self.assertEqual(["bar"], summaries["bar-1"]["tools"])
+
+    def test_list_developer_packages(self):
+        import io
+        import contextlib
+        from deliver import cli
+
+        @early()
+        def tools():
+            return ["bar"]
+
+        self.dev_repo.add("foo", version="1", tools=["foo"])
+        self.dev_repo.add("foo", version="2", tools=["foo"])
+        self.dev_repo.add("bar", version="1", tools=tools)
+
+        self._new_loader()
+        stdout = io.StringIO()
+        with patch.object(DeveloperPackage, "from_path",
+                          wraps=DeveloperPackage.from_path) as evaluate, \
+                contextlib.redirect_stdout(stdout):
+            cli.list_developer_packages(["foo"])
+
+        listed = stdout.getvalue().split("=" * 30)[-1].split()
+        self.assertEqual(["foo-1", "foo-2"], sorted(listed))
+        # other families are not evaluated for listing
+        evaluated = [call.args[0] for call in evaluate.call_args_list]
+        self.assertFalse([path for path in evaluated if "bar" in path])
+
+    def test_threaded_loading(self):
+        @early()
+        def tools():
+            import os
+            import time
+            time.sleep(0.01)
+            return [os.path.basename(os.getcwd())]
+
+        names = ["pkg%d" % i for i in range(8)]
+        for name in names:
+            self.dev_repo.add(name, tools=tools)
+
+        loader = self._new_loader()
+
+        def find(name):
+            return loader.find(PackageRequest(name)).tools[0]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(find, names))
+
+        self.assertEqual(names, results)
+
+    def test_paused_iteration(self):
+        self.dev_repo.add("foo", version="1")
+        self.dev_repo.add("bar", version="1")
+
+        loader = self._new_loader()
+        families = loader.iter_package_families()
+        summaries = loader.iter_package_summaries()
+        first = next(families)
+        next(summaries)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # not blocked by paused iterations
+            future = executor.submit(loader.find, PackageRequest("foo"))
+            self.assertEqual("foo-1", future.result(timeout=10).qualified_name)
+
+            # and can be resumed from other thread
+            future = executor.submit(list, families)
+            names = [f.name for f in [first] + future.result(timeout=10)]
+            self.assertIn("foo", names)
+            self.assertIn("bar", names)
+
+    @patch.object(DevPkgRepo, "_git_tags", return_value=["1.0", "1.1", "1.2"])
+    def test_code_cache(self, mock_git_tags):
+        @early()
+        def version():
+            import os
+            return os.getenv("REZ_DELIVER_PKG_PAYLOAD_VER", "0")
+
+        self.dev_repo.add("bar", version=version, git_url=".../bar.git")
+
+        code_cache.clear()
+        misses = code_cache.misses
+
+        with self._deliver_config(cache_root=None):
+            loader = self._new_loader()
+            versions = loader._get_repo(self.dev_repo_path)["bar"]
+
+        self.assertEqual(["1.0", "1.1", "1.2"], sorted(versions))
+        # compiled once for base evaluation, reused for each tag
+        self.assertEqual(1, code_cache.misses - misses)
+
+    def test_loaded_cache_eviction(self):
+        for name in ("foo", "bar", "egg"):
+            self.dev_repo.add(name, version="1", requires=["python-3"])
+
+        with self._deliver_config(max_loaded_families=2):
+            loader = self._new_loader()
+            repo = loader._get_repo(self.dev_repo_path)
+            foo = repo["foo"]["1"]
+            bar = repo["bar"]["1"]
+            repo["foo"]  # hit, bar becomes the least recently used
+            repo["egg"]
+
+        self.assertEqual(["egg", "foo"], sorted(repo._loaded_cache))
+        stats = loader.cache_stats()[self.dev_repo_path]
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(3, stats["misses"])
+        self.assertEqual(1, stats["evictions"])
+        # interned, and shared list is read-only
+        self.assertIs(foo["requires"], bar["requires"])
+        with self.assertRaises(TypeError):
+            foo["requires"].append("egg")
+        self.assertEqual(["python-3"], bar["requires"])
+        requires = copy.deepcopy(foo["requires"])
+        requires.append("egg")
+        self.assertEqual(["python-3"], bar["requires"])
+
+        with self._deliver_config(max_loaded_families=2):
+            package = loader.find(PackageRequest("bar"))
+        self.assertEqual("bar-1", package.qualified_name)
+
+    def test_prefetch_git_tags(self):
+        @early()
+        def version():
+            import os
+            return os.getenv("REZ_DELIVER_PKG_PAYLOAD_VER", "0")
+
+        foo_url = self._git_remote("foo", ["1.0", "1.1"])
+        bar_url = self._git_remote("bar", ["2.0"])
+        self.dev_repo.add("foo", version=version, git_url=foo_url)
+        self.dev_repo.add("egg", version=version, git_url=foo_url)
+        self.dev_repo.add("bar", version=version, git_url=bar_url)
+
+        loader = self._new_loader()
+        repo = loader._get_repo(self.dev_repo_path)
+
+        with patch("deliver.git.ls_remote_tags",
+                   wraps=ls_remote_tags) as ls_remote:
+            repo.preload()
+        # identical urls listed once
+        self.assertEqual(2, ls_remote.call_count)
+
+        with patch("deliver.git.ls_remote_tags",
+                   side_effect=AssertionError("listed")):
+            versions = dict(repo.iter_dev_packages())
+
+        self.assertEqual(["1.0", "1.1"], sorted(versions["foo"]))
+        self.assertEqual(["1.0", "1.1"], sorted(versions["egg"]))
+        self.assertEqual(["2.0"], sorted(versions["bar"]))
+
+    def test_git_tag_cache(self):
+        @early()
+        def version():
+            import os
+            return os.getenv("REZ_DELIVER_PKG_PAYLOAD_VER", "0")
+
+        url = self._git_remote("foo", ["1.0"])
+        self.dev_repo.add("foo", version=version, git_url=url)
+
+        loader = self._new_loader()
+        self.assertEqual("foo-1.0",
+                         loader.find(PackageRequest("foo")).qualified_name)
+
+        # new tag, but cached ones are still fresh
+        subprocess.check_call(["git", "-C", url, "tag", "1.1"])
+        loader = self._new_loader()
+        with patch("deliver.git.ls_remote_tags",
+                   side_effect=AssertionError("listed")):
+            package = loader.find(PackageRequest("foo"))
+        self.assertEqual("foo-1.0", package.qualified_name)
+
+        # stale ones are served, and revalidated in background
+        with self._deliver_config(git_tag_cache_ttl=0):
+            loader = self._new_loader()
+            repo = loader._get_repo(self.dev_repo_path)
+            package = loader.find(PackageRequest("foo"))
+            self.assertEqual("foo-1.0", package.qualified_name)
+            repo._tag_cache.join()
+
+        loader = self._new_loader()
+        self.assertEqual("foo-1.1",
+                         loader.find(PackageRequest("foo")).qualified_name)
+
+        # forced refresh
+        subprocess.check_call(["git", "-C", url, "tag", "1.2"])
+        loader.refresh_git_tags()
+        self.assertEqual("foo-1.2",
+                         loader.find(PackageRequest("foo")).qualified_name)
+
+        # refreshed only once, tag cache is used afterward
+        loader._get_repo(self.dev_repo_path).invalidate()
+        with patch("deliver.git.ls_remote_tags",
+                   side_effect=AssertionError("listed")):
+            package = loader.find(PackageRequest("foo"))
+        self.assertEqual("foo-1.2", package.qualified_name)
+
+    def test_git_tag_mirror(self):
+        @early()
+        def version():
+            import os
+            return os.getenv("REZ_DELIVER_PKG_PAYLOAD_VER", "0")
+
+        url = self._git_remote("foo", ["1.0", "1.1"])
+        self.dev_repo.add("foo", version=version, git_url=url)
+
+        with self._deliver_config(git_tag_mirrors=True):
+            loader = self._new_loader()
+            with patch("deliver.git.ls_remote_tags",
+                       side_effect=AssertionError("listed")):
+                package = loader.find(PackageRequest("foo"))
+            self.assertEqual("foo-1.1", package.qualified_name)
+
+            mirrors = os.path.join(self.root, "cache", "mirrors")
+            self.assertEqual(1, len(os.listdir(mirrors)))
+
+            # incremental update
+            subprocess.check_call(["git", "-C", url, "tag", "1.2"])
+            loader.refresh_git_tags()
+            package = loader.find(PackageRequest("foo"))
+            self.assertEqual("foo-1.2", package.qualified_name)
+
+    def test_read_local_tags(self):
+        url = self._git_remote("foo", ["1.0", "1.1"])
+        subprocess.check_call(["git", "-C", url, "pack-refs", "--all"])
+        subprocess.check_call(["git", "-C", url, "tag", "rc/1.2"])
+
+        tags = read_local_tags(os.path.join(url, ".git"))
+        self.assertEqual(["1.0", "1.1", "rc/1.2"], sorted(tags))
+
+    @patch.object(DevPkgRepo, "_git_tags", return_value=["1.0", "1.1", "1.2"])
+    def test_lazy_git_tags(self, mock_git_tags):
+        @early()
+        def version():
+            import os
+            return os.getenv("REZ_DELIVER_PKG_PAYLOAD_VER", "0") + "-p1"
+
+        self.dev_repo.add("foo", version=version, git_url=".../foo.git")
+
+        with self._deliver_config(lazy_evaluation=True):
+            loader = self._new_loader()
+            repo = loader._get_repo(self.dev_repo_path)
+            with patch.object(DevPkgRepo, "_evaluate",
+                              wraps=repo._evaluate) as evaluate:
+                versions = repo["foo"]
+                # base and latest tag
+                self.assertEqual(2, evaluate.call_count)
+                self.assertEqual(["1.0-p1", "1.1-p1", "1.2-p1"],
+                                 sorted(versions))
+                self.assertFalse(versions.is_loaded("1.1-p1"))
+
+                package = loader.find(PackageRequest("foo==1.1-p1"))
+                self.assertEqual("1.1", package.data["__ver_tag__"])
+                self.assertEqual(3, evaluate.call_count)
+
+        self.assertTrue(versions.is_loaded("1.1-p1"))
+        self.assertFalse(versions.is_loaded("1.0-p1"))
+
+    @patch.object(DevPkgRepo, "_git_tags", return_value=["1.0", "1.1", "1.2"])
+    def test_lazy_git_tags_preload(self, mock_git_tags):
+        @early()
+        def version():
+            import os
+            return os.getenv("REZ_DELIVER_PKG_PAYLOAD_VER", "0") + "-p1"
+
+        self.dev_repo.add("foo", version=version, git_url=".../foo.git")
+        self.dev_repo.add("bar", version="1")
+
+        with self._deliver_config(lazy_evaluation=True,
+                                  evaluation_processes=2):
+            loader = self._new_loader()
+            list(loader.iter_package_families())
+
+            repo = loader._get_repo(self.dev_repo_path)
+            versions = repo["foo"]
+            # preload didn't evaluate all tags in workers
+            self.assertIsInstance(versions, _LazyVersions)
+            self.assertFalse(versions.is_loaded("1.1-p1"))
+
+    @patch.object(DevPkgRepo, "_git_tags", return_value=["1.0", "1.1", "1.2"])
+    def test_lazy_git_tag_version_mismatch(self, mock_git_tags):
+        @early()
+        def version():
+            import os
+            ver = os.getenv("REZ_DELIVER_PKG_PAYLOAD_VER", "0")
+            return "1.1.0" if ver == "1.1" else ver
+
+        self.dev_repo.add("foo", version=version, git_url=".../foo.git")
+
+        with self._deliver_config(lazy_evaluation=True):
+            loader = self._new_loader()
+            repo = loader._get_repo(self.dev_repo_path)
+            self.assertIsNone(loader.find(PackageRequest("foo==1.1")))
+            # dropped and reported
+            self.assertEqual(["1.0", "1.2"], sorted(repo["foo"]))
+            failures = loader.evaluation_failures()
+
+        self.assertEqual(1, len(failures))
+        self.assertIn("1.1.0", failures[0])
+
+    def test_select_tags(self):
+        tags = ["1.0", "1.0^{}", "1.1", "1.2-rc1", "2.0", "2.1", "bad tag",
+                "3.0-beta"]
+
+        self.assertEqual(["2.0", "2.1", "3.0-beta"],
+                         select_tags(tags, limit=3))
+        self.assertEqual(["1.0", "1.1", "2.0", "2.1"],
+                         select_tags(tags, exclude=r"-(rc|beta)"))
+        self.assertEqual(["1.1", "1.2-rc1"],
+                         select_tags(tags, include=r"^1\.", range_="1.1+",
+                                     limit=2))
+
+    @patch.object(DevPkgRepo, "_git_tags",
+                  return_value=["1.0", "1.1", "2.0", "2.1-rc1"])
+    def test_package_git_tag_policy(self, mock_git_tags):
+        @early()
+        def version():
+            import os
+            return os.getenv("REZ_DELIVER_PKG_PAYLOAD_VER", "0")
+
+        self.dev_repo.add("foo", version=version, git_url=".../foo.git",
+                          git_tag_policy={"exclude": "-rc"})
+        self.dev_repo.add("bar", version=version, git_url=".../bar.git")
+
+        with self._deliver_config(git_tag_policy={"limit": 2}):
+            loader = self._new_loader()
+            repo = loader._get_repo(self.dev_repo_path)
+            self.assertEqual(["1.1", "2.0"], sorted(repo["foo"]))
+            self.assertEqual(["2.0", "2.1-rc1"], sorted(repo["bar"]))
+
+    @patch.object(DevPkgRepo, "_git_tags", return_value=["1.0", "1.1", "1.2"])
+    def test_subprocess_memo(self, mock_git_tags):
+        @early()
+        def version():
+            import os
+            return os.getenv("REZ_DELIVER_PKG_PAYLOAD_VER", "0")
+
+        @early()
+        def authors():
+            import subprocess
+            output = subprocess.check_output(
+                "echo run >> $DELIVER_TEST_COUNTER; echo joe",
+                shell=True,
+                universal_newlines=True,
+            )
+            return [output.strip()]
+
+        self.dev_repo.add("foo", version=version, authors=authors,
+                          git_url=".../foo.git")
+        counter = os.path.join(self.root, "counter")
+
+        def spawned():
+            with open(counter) as f:
+                return len(f.readlines())
+
+        subprocess_memo.clear()
+        with self._deliver_config(memoize_subprocess=True, cache_root=None), \
+                patch.dict(os.environ, {"DELIVER_TEST_COUNTER": counter}):
+            loader = self._new_loader()
+            repo = loader._get_repo(self.dev_repo_path)
+            versions = repo["foo"]
+
+            self.assertEqual(["1.0", "1.1", "1.2"], sorted(versions))
+            for ver in versions:
+                self.assertEqual(["joe"], versions[ver]["authors"])
+            # command doesn't depend on tag, spawned once for all tags
+            self.assertEqual(1, spawned())
+            # `check_output` and the `run` it calls are keyed once
+            self.assertEqual(1, subprocess_memo.misses)
+
+            # but not after package.py has been edited
+            filepath = versions["1.1"]["__source__"]
+            mtime = os.stat(filepath).st_mtime + 10
+            os.utime(filepath, (mtime, mtime))
+            repo._evaluate_file(filepath, ver_tag="1.1")
+            self.assertEqual(2, spawned())
+
+    @patch.object(DevPkgRepo, "_git_tags", return_value=["1.0", "1.1", "1.2"])
+    def test_subprocess_memo_env(self, mock_git_tags):
+        @early()
+        def version():
+            import os
+            return os.getenv("REZ_DELIVER_PKG_PAYLOAD_VER", "0")
+
+        @early()
+        def authors():
+            import subprocess
+            output = subprocess.check_output(
+                "echo run >> $DELIVER_TEST_COUNTER; "
+                "echo payload-$REZ_DELIVER_PKG_PAYLOAD_VER",
+                shell=True,
+                universal_newlines=True,
+            )
+            return [output.strip()]
+
+        self.dev_repo.add("foo", version=version, authors=authors,
+                          git_url=".../foo.git")
+        counter = os.path.join(self.root, "counter")
+
+        def spawned():
+            with open(counter) as f:
+                return len(f.readlines())
+
+        subprocess_memo.clear()
+        with self._deliver_config(
+                memoize_subprocess=True,
+                memoize_subprocess_env=["REZ_DELIVER_PKG_PAYLOAD_VER"],
+                cache_root=None), \
+                patch.dict(os.environ, {"DELIVER_TEST_COUNTER": counter}):
+            loader = self._new_loader()
+            repo = loader._get_repo(self.dev_repo_path)
+            versions = repo["foo"]
+
+            for ver in versions:
+                self.assertEqual(["payload-" + ver],
+                                 versions[ver]["authors"])
+            # base evaluation and 3 tags
+            self.assertEqual(4, spawned())
+
+            # re-evaluating same tag is memoized
+            filepath = versions["1.1"]["__source__"]
+            data = repo._evaluate_file(filepath, ver_tag="1.1")
+            self.assertEqual(["payload-1.1"], data["authors"])
+            self.assertEqual(4, spawned())
+
+    def test_evaluation_timeout(self):
+        from deliver import repository
+
+        @early()
+        def authors():
+            import time
+            time.sleep(60)
+            return ["hanging"]
+
+        self.dev_repo.add("foo", version="1", tools=["foo"])
+        self.dev_repo.add("bar", version="1", authors=authors)
+
+        start = time.time()
+        with self._deliver_config(evaluation_timeout=2, cache_root=None):
+            loader = self._new_loader()
+            names = sorted(name for name, _ in
+                           loader._get_repo(self.dev_repo_path)
+                           .iter_dev_packages())
+            failures = loader.evaluation_failures()
+
+        self.assertLess(time.time() - start, 30)
+        self.assertEqual(["bar", "foo"], names)
+        repo = loader._get_repo(self.dev_repo_path)
+        self.assertEqual(["foo"], repo["foo"]["1"]["tools"])
+        self.assertEqual(1, len(failures))
+        self.assertIn(os.path.join("bar", "1"), failures[0])
+
+        with self._deliver_config(evaluation_timeout=2, cache_root=None), \
+                patch.object(repository._watchdog, "run",
+                             wraps=repository._watchdog.run) as run:
+            # failed one is not re-evaluated after eviction
+            repo.invalidate(["foo", "bar"])
+            list(repo.iter_dev_packages())
+            self.assertEqual(1, run.call_count)
+
+            # until its package.py changed
+            filepath = os.path.join(self.dev_repo_path, "bar", "1",
+                                    "package.py")
+            mtime = os.stat(filepath).st_mtime + 10
+            os.utime(filepath, (mtime, mtime))
+            repo.invalidate(["bar"])
+            list(repo.iter_dev_packages())
+            self.assertEqual(2, run.call_count)
+
+    def test_parallel_evaluation_timeout(self):
+        @early()
+        def authors():
+            import time
+            time.sleep(60)
+            return ["hanging"]
+
+        self.dev_repo.add("foo", version="1", tools=["foo"])
+        self.dev_repo.add("bar", version="1", authors=authors)
+
+        with self._deliver_config(evaluation_timeout=2, cache_root=None,
+                                  evaluation_processes=2):
+            loader = self._new_loader()
+            loader.preload()
+            failures = loader.evaluation_failures()
+
+        # recorded in worker and returned to parent
+        self.assertEqual(1, len(failures))
+        self.assertIn(os.path.join("bar", "1"), failures[0])
+
+    def test_lazy_evaluation_timeout(self):
+        @early()
+        def authors():
+            import time
+            time.sleep(60)
+            return ["hanging"]
+
+        self.dev_repo.add("bar", version="1", tools=["bar"])
+        self.dev_repo.add("bar", version="2", authors=authors)
+
+        start = time.time()
+        with self._deliver_config(evaluation_timeout=2, cache_root=None,
+                                  lazy_evaluation=True):
+            loader = self._new_loader()
+            package = loader.find(PackageRequest("bar"))
+            failures = loader.evaluation_failures()
+
+        self.assertLess(time.time() - start, 30)
+        self.assertEqual("bar-1", package.qualified_name)
+        self.assertEqual(["bar"], package.tools)
+        self.assertEqual(1, len(failures))
+        self.assertIn(os.path.join("bar", "2"), failures[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
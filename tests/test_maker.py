@@ -0,0 +1,234 @@
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import threading
+from unittest.mock import patch
+from deliver.api import PackageLoader
+from deliver.maker import rez as maker_rez
+from deliver.lib import override_config, current_scope
+from tests.util import TestBase
+
+
+class TestMaker(TestBase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp(prefix="rez_deliver_test_")
+        install_path = os.path.join(root, "install")
+        release_path = os.path.join(root, "release")
+        cache_root = os.path.join(root, "cache")
+
+        self.root = root
+        self.install_path = install_path
+        self.release_path = release_path
+        self.settings = {
+            "packages_path": [install_path, release_path],
+            "local_packages_path": install_path,
+            "release_packages_path": release_path,
+            "plugins": {
+                "command": {"deliver": {
+                    "dev_repository_roots": [],
+                    "cache_root": cache_root,
+                }}
+            }
+        }
+        super(TestMaker, self).setUp()
+
+        PackageLoader.clear_instance()
+
+    def tearDown(self):
+        super(TestMaker, self).tearDown()
+        retries = 5
+        if os.path.exists(self.root):
+            for i in range(retries):
+                try:
+                    shutil.rmtree(self.root)
+                    break
+                except Exception:
+                    if i < (retries - 1):
+                        time.sleep(0.2)
+
+    def _deliver_config(self, **entries):
+        deliver = self.settings["plugins"]["command"]["deliver"].copy()
+        deliver.update(entries)
+        return override_config({"plugins": {"command": {"deliver": deliver}}})
+
+    def _touch(self, *names):
+        dirpath = os.path.join(self.root, *names[:-1])
+        if not os.path.isdir(dirpath):
+            os.makedirs(dirpath)
+        open(os.path.join(dirpath, names[-1]), "w").close()
+
+    @patch.object(maker_rez, "fetch_rez_version_from_pypi",
+                  side_effect=AssertionError("online"))
+    def test_offline_rez_version(self, mock_fetch):
+        wheelhouse = os.path.join(self.root, "wheelhouse")
+        self._touch("wheelhouse", "rez-2.100.0.tar.gz")
+        self._touch("wheelhouse", "rez-2.114.1-py3-none-any.whl")
+
+        with self._deliver_config(rez_version_index=wheelhouse,
+                                  pypi_offline=True):
+            self.assertEqual("2.114.1", maker_rez.get_rez_version())
+
+            # cached
+            self._touch("wheelhouse", "rez-2.115.0.tar.gz")
+            self.assertEqual("2.114.1", maker_rez.get_rez_version())
+
+        with self._deliver_config(rez_version_index=wheelhouse,
+                                  pypi_offline=True,
+                                  rez_version_ttl=0):
+            self.assertEqual("2.115.0", maker_rez.get_rez_version())
+
+        # no index and offline, stale cache is still used
+        with self._deliver_config(pypi_offline=True, rez_version_ttl=0):
+            self.assertEqual("2.115.0", maker_rez.get_rez_version())
+
+    def _add_python(self, version):
+        dirpath = os.path.join(self.install_path, "python", version)
+        os.makedirs(dirpath)
+        with open(os.path.join(dirpath, "package.py"), "w") as f:
+            f.write("name = 'python'\nversion = '%s'\n" % version)
+
+        family_path = os.path.dirname(dirpath)
+        mtime = os.stat(family_path).st_mtime + len(os.listdir(family_path))
+        os.utime(family_path, (mtime, mtime))
+
+    def test_python_versions_index(self):
+        self._add_python("3.7.4")
+        self._add_python("3.7.9")
+
+        self.assertEqual(["3.7"],
+                         maker_rez.find_python_package_versions(False))
+
+        with patch.object(maker_rez, "iter_packages",
+                          side_effect=AssertionError("scanned")):
+            self.assertEqual(["3.7"],
+                             maker_rez.find_python_package_versions(False))
+
+        self._add_python("3.9.1")
+        self.assertEqual(["3.7", "3.9"],
+                         maker_rez.find_python_package_versions(False))
+
+    def test_pip_tree_cache(self):
+        def pip_install(args, **kwargs):
+            target = args[args.index("--target") + 1]
+            for lib in ["rez", "rezplugins"]:
+                os.makedirs(os.path.join(target, lib))
+                self._touch(target, lib, "__init__.py")
+
+        wheelhouse = os.path.join(self.root, "wheelhouse")
+
+        with self._deliver_config(rez_wheelhouse=wheelhouse), \
+                patch.object(maker_rez.subprocess, "check_call",
+                             side_effect=pip_install) as pip:
+            for repo in ["repo_a", "repo_b", "release"]:
+                repo_path = os.path.join(self.root, repo)
+                maker_rez.build_rez_via_pip(repo_path,
+                                            "rez==2.114.1",
+                                            "2.114.1",
+                                            python_version="3.7")
+
+        # pip only runs once
+        self.assertEqual(1, pip.call_count)
+        args = pip.call_args[0][0]
+        self.assertEqual(wheelhouse, args[args.index("--find-links") + 1])
+
+        inodes = dict()
+        for repo in ["repo_a", "repo_b", "release"]:
+            package_path = os.path.join(self.root, repo, "rez", "2.114.1")
+            init = [
+                os.path.join(dirpath, "__init__.py")
+                for dirpath, dirs, files in os.walk(package_path)
+                if os.path.basename(dirpath) == "rezplugins"
+            ]
+            self.assertEqual(1, len(init))
+            self.assertTrue(os.path.isfile(init[0]))
+            inodes[repo] = os.stat(init[0]).st_ino
+
+        # local installs are linked to cache, release is a real copy
+        self.assertEqual(inodes["repo_a"], inodes["repo_b"])
+        self.assertNotEqual(inodes["repo_a"], inodes["release"])
+
+    def test_install_variants_in_parallel(self):
+        barrier = threading.Barrier(3, timeout=10)
+        logs = []
+
+        def install(repo_path, index, log=None):
+            # would be broken if variants are not installed concurrently
+            barrier.wait()
+            log.write("installed variant %d" % index)
+            logs.append(log.name)
+
+        maker_rez.install_variants_in_parallel(
+            install,
+            self.install_path,
+            [0, 1, 2],
+            log_names=["py-3.7", "py-3.8", "py-3.9"],
+        )
+
+        self.assertEqual(["py-3.7.log", "py-3.8.log", "py-3.9.log"],
+                         sorted(os.path.basename(f) for f in logs))
+        with open(sorted(logs)[1]) as f:
+            self.assertEqual("installed variant 1", f.read())
+
+    def test_install_rez_variants(self):
+        barrier = threading.Barrier(2, timeout=10)
+        solved = []
+
+        class Context(object):
+            def __init__(self, requires, building=False):
+                solved.append((requires[-1],
+                               threading.current_thread(),
+                               current_scope() is not None))
+
+            def which(self, name):
+                return name
+
+            def execute_shell(self, command, block=False, **kwargs):
+                # would be broken if pip installs are not concurrent
+                barrier.wait()
+                return 0, None, None
+
+        with patch.object(maker_rez, "get_rez_version",
+                          return_value="2.114.1"), \
+                patch.object(maker_rez, "find_python_package_versions",
+                             return_value=["3.7", "3.9"]), \
+                patch.object(maker_rez, "ResolvedContext", Context):
+            maker = maker_rez.pkg_rez(False)
+            maker.__install_variants__(self.install_path, [0, 1])
+
+        # solved in serial, in evaluation scope
+        self.assertEqual(
+            [("python-3.7", threading.current_thread(), True),
+             ("python-3.9", threading.current_thread(), True)],
+            solved
+        )
+
+    def test_package_lock(self):
+        entered = threading.Event()
+        released = threading.Event()
+
+        def hold():
+            with maker_rez._package_lock(self.install_path, "rez", "2"):
+                entered.set()
+                released.wait(10)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        entered.wait(10)
+        with self.assertRaises(Exception):
+            with maker_rez._package_lock(self.install_path, "rez", "2",
+                                         timeout=0.2):
+                pass
+        released.set()
+        thread.join()
+
+        with maker_rez._package_lock(self.install_path, "rez", "2",
+                                     timeout=1):
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
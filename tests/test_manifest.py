@@ -137,6 +137,47 @@ class TestManifest(TestBase):
         for req in manifest:
             self.assertEqual(self.installer.Ready, req.status)
 
+    def test_build_context_memo(self):
+        from deliver import solve
+
+        self.dev_repo.add("python", version="2.7")
+        self.dev_repo.add("python", version="3.7")
+        self.dev_repo.add("foo", variants=[["python-2"], ["python-3"]])
+        self.dev_repo.add("bar", variants=[["python-2"], ["python-3"]])
+
+        deliver = self.settings["plugins"]["command"]["deliver"].copy()
+        deliver["keep_build_contexts"] = True
+
+        with override_config({"plugins": {"command": {"deliver": deliver}}}), \
+                patch.object(solve, "ResolvedContext",
+                             wraps=solve.ResolvedContext) as resolved:
+            self.installer.resolve("foo", "bar")
+            self.assertEqual(6, len(self.installer.manifest()))
+            # [python-2], [python-3] and [] for python itself
+            self.assertEqual(3, resolved.call_count)
+
+            self.installer.resolve("bar")
+            self.assertEqual(4, len(self.installer.manifest()))
+            self.assertEqual(3, resolved.call_count)
+
+            # re-solve after developer packages changed
+            self.installer.loader._get_repo(self.dev_repo_path).invalidate()
+            self.installer.resolve("bar")
+            self.assertEqual(6, resolved.call_count)
+
+    def test_shared_requirement_listed_once(self):
+        self.dev_repo.add("foo", version="1")
+        names = ["bar%d" % i for i in range(20)]
+        for name in names:
+            self.dev_repo.add(name, version="1", requires=["foo"])
+
+        self.installer.resolve(*names)
+
+        manifest = self.installer.manifest()
+        self.assertIsInstance(manifest, list)
+        self.assertEqual(["foo-1"] + [n + "-1" for n in names],
+                         [r.name for r in manifest])
+
     def test_resolve_early_build(self):
 
         @early()
@@ -0,0 +1,206 @@
+
+import os
+import time
+import shutil
+import tarfile
+import hashlib
+import tempfile
+import unittest
+import subprocess
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import pathname2url
+from deliver.api import PackageLoader, PackageInstaller
+from deliver.cache import PayloadCache
+from deliver.exceptions import RezDeliverPayloadError
+from deliver.lib import override_config
+from tests.util import TestBase
+
+
+class TestPayload(TestBase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp(prefix="rez_deliver_test_")
+        install_path = os.path.join(root, "install")
+        release_path = os.path.join(root, "release")
+        cache_root = os.path.join(root, "cache")
+
+        self.root = root
+        self.cache_root = cache_root
+        self.settings = {
+            "packages_path": [install_path, release_path],
+            "local_packages_path": install_path,
+            "release_packages_path": release_path,
+            "plugins": {
+                "command": {"deliver": {
+                    "dev_repository_roots": [],
+                    "cache_root": cache_root,
+                }}
+            }
+        }
+        super(TestPayload, self).setUp()
+
+        PackageLoader.clear_instance()
+        self.installer = PackageInstaller(PackageLoader())
+
+    def tearDown(self):
+        super(TestPayload, self).tearDown()
+        retries = 5
+        if os.path.exists(self.root):
+            for i in range(retries):
+                try:
+                    shutil.rmtree(self.root)
+                    break
+                except Exception:
+                    if i < (retries - 1):
+                        time.sleep(0.2)
+
+    def _deliver_config(self, **entries):
+        deliver = self.settings["plugins"]["command"]["deliver"].copy()
+        deliver.update(entries)
+        return override_config({"plugins": {"command": {"deliver": deliver}}})
+
+    def _git_remote(self, name, tags):
+        path = os.path.join(self.root, "remotes", name)
+        git = ["git", "-C", path,
+               "-c", "user.name=deliver", "-c", "user.email=deliver@test"]
+        os.makedirs(path)
+        subprocess.check_call(git + ["init", "-q"])
+        for tag in tags:
+            with open(os.path.join(path, "VERSION"), "w") as f:
+                f.write(tag)
+            subprocess.check_call(git + ["add", "VERSION"])
+            subprocess.check_call(git + ["commit", "-q", "-m", tag])
+            subprocess.check_call(git + ["tag", tag])
+        return path
+
+    def test_git_payload_env(self):
+        url = self._git_remote("foo", ["1.0", "1.1"])
+
+        with self._deliver_config(git_payload_cache=False):
+            with self.installer._git_payload_env(url, "1.0") as env:
+                self.assertEqual({}, env)
+
+        with self._deliver_config(git_payload_cache=True):
+            with self.installer._git_payload_env(url, "1.0") as env:
+                worktree = env["REZ_DELIVER_PKG_PAYLOAD_WORKTREE"]
+                with open(os.path.join(worktree, "VERSION")) as f:
+                    self.assertEqual("1.0", f.read())
+
+            # new tag is fetched into the same mirror
+            subprocess.check_call(["git", "-C", url, "tag", "1.2"])
+            with self.installer._git_payload_env(url, "1.2") as env_:
+                self.assertEqual(env["REZ_DELIVER_PKG_PAYLOAD_MIRROR"],
+                                 env_["REZ_DELIVER_PKG_PAYLOAD_MIRROR"])
+                worktree_ = env_["REZ_DELIVER_PKG_PAYLOAD_WORKTREE"]
+                with open(os.path.join(worktree_, "VERSION")) as f:
+                    self.assertEqual("1.1", f.read())
+
+            # worktree polluted by previous build gets cleaned
+            with open(os.path.join(worktree, "VERSION"), "w") as f:
+                f.write("modified")
+            os.makedirs(os.path.join(worktree, "build"))
+            open(os.path.join(worktree, "build", "foo.o"), "w").close()
+            with self.installer._git_payload_env(url, "1.0") as env:
+                self.assertEqual(worktree,
+                                 env["REZ_DELIVER_PKG_PAYLOAD_WORKTREE"])
+                with open(os.path.join(worktree, "VERSION")) as f:
+                    self.assertEqual("1.0", f.read())
+                self.assertEqual([".git", "VERSION"],
+                                 sorted(os.listdir(worktree)))
+
+    def test_git_payload_worktree_locked(self):
+        from deliver.git import checkout_worktree
+
+        url = self._git_remote("foo", ["1.0"])
+
+        def other_checkout():
+            with checkout_worktree(git_dir, "1.0", worktree,
+                                   timeout=0.5) as path_:
+                return path_
+
+        with self._deliver_config(git_payload_cache=True):
+            with self.installer._git_payload_env(url, "1.0") as env:
+                git_dir = env["REZ_DELIVER_PKG_PAYLOAD_MIRROR"]
+                worktree = env["REZ_DELIVER_PKG_PAYLOAD_WORKTREE"]
+                # not touched by other checkout while being used
+                with ThreadPoolExecutor(1) as executor:
+                    path = executor.submit(other_checkout).result()
+                self.assertIsNone(path)
+
+            self.assertEqual(worktree, other_checkout())
+
+    def _archive(self, name, files):
+        src = os.path.join(self.root, "src", name)
+        os.makedirs(src)
+        for filename, content in files.items():
+            with open(os.path.join(src, filename), "w") as f:
+                f.write(content)
+
+        archive = os.path.join(self.root, name + ".tar.gz")
+        with tarfile.open(archive, "w:gz") as tar:
+            tar.add(src, arcname=name)
+
+        with open(archive, "rb") as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+
+        return "file:" + pathname2url(archive), sha256
+
+    def test_payload_cache(self):
+        url, sha256 = self._archive("foo-1.0", {"VERSION": "1.0"})
+
+        with self._deliver_config():
+            cache = PayloadCache.from_config()
+            archive = cache.fetch(url, sha256=sha256)
+
+            # downloaded once
+            with patch("deliver.cache.urlopen",
+                       side_effect=AssertionError("downloaded")):
+                self.assertEqual(archive, cache.fetch(url))
+                self.assertEqual(archive, cache.fetch("file:///x", sha256))
+
+                build_dir = os.path.join(self.root, "build")
+                cache.extract(url, build_dir, sha256=sha256)
+
+        with open(os.path.join(build_dir, "foo-1.0", "VERSION")) as f:
+            self.assertEqual("1.0", f.read())
+
+        url, _ = self._archive("bar-1.0", {"VERSION": "1.0"})
+        with self._deliver_config():
+            cache = PayloadCache.from_config()
+            with self.assertRaises(RezDeliverPayloadError):
+                cache.fetch(url, sha256="0" * 64)
+            # nothing cached from mismatched download
+            self.assertIsNone(cache._read_url_index(url))
+
+    def test_payload_cache_env(self):
+        from deliver import payload
+
+        url, sha256 = self._archive("foo-1.0", {"VERSION": "1.0"})
+        cache_root = os.path.join(self.root, "build-cache")
+
+        with self._deliver_config(cache_root=None), \
+                patch.dict(os.environ,
+                           {"REZ_DELIVER_PAYLOAD_CACHE": cache_root}):
+            archive = payload.fetch(url, sha256=sha256)
+        self.assertTrue(archive.startswith(cache_root))
+
+    def test_payload_without_cache(self):
+        url, sha256 = self._archive("foo-1.0", {"VERSION": "1.0"})
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir)
+
+        with self._deliver_config(cache_root=None), \
+                patch.object(tempfile, "tempdir", tmp_dir):
+            cache = PayloadCache.from_config()
+            build_dir = os.path.join(self.root, "build")
+            cache.extract(url, build_dir, sha256=sha256)
+
+        with open(os.path.join(build_dir, "foo-1.0", "VERSION")) as f:
+            self.assertEqual("1.0", f.read())
+        # temp download removed
+        self.assertEqual([], os.listdir(tmp_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()